@@ -4,24 +4,30 @@ Optimized Amazon Scraping DAG with advanced error handling, monitoring, and effi
 
 from datetime import datetime, timedelta
 import os
-import json
+import orjson
+import zstandard
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.compute as pc
+import pyarrow.json as pa_json
+import pyarrow.csv as pa_csv
 from airflow import DAG
-from airflow.operators.python import PythonOperator, BranchPythonOperator
-from airflow.operators.dummy import DummyOperator
-from airflow.sensors.filesystem import FileSensor
+from airflow.operators.python import PythonOperator
+from airflow.operators.empty import EmptyOperator
 from airflow.models import Variable
-from airflow.utils.task_group import TaskGroup
 from airflow.utils.trigger_rule import TriggerRule
-from airflow.exceptions import AirflowSkipException
-from airflow.utils.session import create_session
-from airflow.models.taskinstance import TaskInstance
 
 import sys
-import os
 import time
-from functools import wraps
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Dict, Any
+import random
+import importlib.util
+import atexit
+import threading
+from functools import wraps, lru_cache, partial
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+from typing import List, Dict, Any, Iterator
 
 # Add the project root to the Python path
 sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
@@ -34,6 +40,8 @@ from extraction.commentaire import scrape_reviews
 from utils.file_utils import merge_csv_files, clean_data, export_to_json
 from utils.scraping_logger import get_logger, scraper_logger
 from utils.scraping_metrics import metrics, time_operation
+from utils.request_utils import create_session as create_http_session
+from utils.token_bucket import get_amazon_bucket, is_rate_limited_error, RATE_LIMIT_PENALTY_SECONDS
 
 # Configure logger
 logger = get_logger('airflow_dag')
@@ -50,12 +58,19 @@ default_args = {
     'max_retry_delay': timedelta(minutes=30),  # Maximum retry delay
     'execution_timeout': timedelta(hours=2),
     'start_date': datetime(2023, 1, 1),
-    'pool': 'scraper_pool',
     'priority_weight': 10,
-    'wait_for_downstream': True,  # Wait for downstream tasks to complete
     'trigger_rule': TriggerRule.ALL_SUCCESS
 }
 
+# Above this many URLs, process_product_details spills them to a file instead of XCom
+MAX_XCOM_URLS = 1000
+
+# Pools: a small one for tasks hitting Amazon, a large one for local work
+HTTP_POOL = 'scraper_http_pool'
+# Size of the HTTP pool: docker-compose creates the pool from this same variable
+HTTP_POOL_SLOTS = int(os.environ.get('SCRAPER_HTTP_POOL_SLOTS', '4'))
+CPU_POOL = 'scraper_cpu_pool'
+
 # Create DAG with enhanced configuration
 dag = DAG(
     'optimized_amazon_scraping',
@@ -68,87 +83,278 @@ dag = DAG(
     tags=['scraping', 'amazon', 'optimized'],
 )
 
-# Enhanced configuration with retry and rate limiting settings
-try:
-    config = Variable.get("amazon_scraper_config", deserialize_json=True)
-except:
-    config = {
-        'categories': ['electronics', 'computers', 'smart-home'],
-        'max_products_per_category': 100,
-        'max_pages_per_category': 5,
-        'scrape_reviews': True,
-        'max_reviews_per_product': 50,
-        'user_agent_rotation': True,
-        'proxy_rotation': True,
-        'request_delay': 2.0,  # Increased delay
+# Default configuration, used when the amazon_scraper_config Variable is not set
+_DEFAULT_CONFIG = {
+    'categories': ['electronics', 'computers', 'smart-home'],
+    'max_products_per_category': 100,
+    'max_pages_per_category': 5,
+    'scrape_reviews': True,
+    'max_reviews_per_product': 50,
+    'user_agent_rotation': True,
+    'proxy_rotation': True,
+    'request_delay': 2.0,  # Increased delay
+    'max_retries': 5,
+    'timeout': 30,
+    'output_directory': 'data',
+    'export_formats': ['csv', 'json'],
+    'batch_size': 10,  # Process products in batches
+    'max_workers': 4,  # Number of parallel workers
+    'retry_config': {
         'max_retries': 5,
-        'timeout': 30,
-        'output_directory': 'data',
-        'export_formats': ['csv', 'json'],
-        'batch_size': 10,  # Process products in batches
-        'max_workers': 4,  # Number of parallel workers
-        'rate_limit': {
-            'requests_per_second': 2,
-            'burst_size': 5
-        },
-        'retry_config': {
-            'max_retries': 5,
-            'base_delay': 2,
-            'max_delay': 30,
-            'exponential_base': 2
-        }
+        'base_delay': 2,
+        'max_delay': 30,
+        'exponential_base': 2
     }
+}
 
-# Rate limiting decorator
-def rate_limit(requests_per_second: float, burst_size: int):
-    """Rate limiting decorator for API calls."""
-    min_interval = 1.0 / requests_per_second
-    last_call_time = 0
-    tokens = burst_size
+@lru_cache(maxsize=1)
+def _load_config() -> Dict[str, Any]:
+    """
+    Load the scraper configuration from the amazon_scraper_config Variable.
+    
+    Cached so repeated parses in the same process don't query the metadata DB again.
+    Only a missing or malformed Variable falls back to the defaults; other errors propagate.
+    
+    Returns:
+        The configuration dictionary
+    """
+    try:
+        return Variable.get("amazon_scraper_config", deserialize_json=True)
+    except (KeyError, ValueError) as e:
+        logger.warning(f"Using default scraper configuration: {str(e)}")
+        return _DEFAULT_CONFIG
 
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            nonlocal last_call_time, tokens
-            current_time = time.time()
-            
-            # Add tokens based on time passed
-            time_passed = current_time - last_call_time
-            tokens = min(burst_size, tokens + time_passed * requests_per_second)
-            
-            if tokens < 1:
-                sleep_time = (1 - tokens) / requests_per_second
-                time.sleep(sleep_time)
-                tokens = 1
-            
-            tokens -= 1
-            last_call_time = time.time()
+# Enhanced configuration with retry and rate limiting settings
+config = _load_config()
+
+# orjson options for the JSON artifacts: pretty-printed like before, with
+# non-string keys (rating distribution) and numpy scalars (pandas stats) allowed
+JSON_DUMP_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+# Rate limiting decorator
+def rate_limit(func):
+    """
+    Rate limiting decorator for API calls.
+    
+    Takes a token from the shared Amazon bucket (utils.token_bucket.get_amazon_bucket) before
+    each call. The bucket is only created on the first call: decorating runs on every DAG
+    parse, which must not connect to Redis.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        bucket = get_amazon_bucket()
+        bucket.acquire()
+        try:
             return func(*args, **kwargs)
-        return wrapper
-    return decorator
+        except Exception as e:
+            if is_rate_limited_error(e):
+                bucket.penalize(RATE_LIMIT_PENALTY_SECONDS)
+            raise
+    return wrapper
 
 # Enhanced retry decorator
 def retry_with_exponential_backoff(max_retries: int, base_delay: int, max_delay: int):
-    """Retry decorator with exponential backoff."""
+    """
+    Retry decorator with exponential backoff.
+    
+    Delays are precomputed once and jittered (x0.5 to x1.5) so that concurrent workers
+    failing together don't retry in lockstep.
+    """
+    delays = tuple(min(base_delay * (2 ** i), max_delay) for i in range(max_retries))
+
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
-            retries = 0
-            while retries < max_retries:
+            for attempt in range(max_retries):
                 try:
                     return func(*args, **kwargs)
                 except Exception as e:
-                    retries += 1
-                    if retries == max_retries:
+                    if attempt == max_retries - 1:
                         raise
                     
-                    delay = min(base_delay * (2 ** (retries - 1)), max_delay)
-                    logger.warning(f"Retry {retries}/{max_retries} after {delay}s due to: {str(e)}")
+                    delay = delays[attempt] * random.uniform(0.5, 1.5)
+                    logger.warning(f"Retry {attempt + 1}/{max_retries} after {delay:.1f}s due to: {str(e)}")
                     time.sleep(delay)
             return None
         return wrapper
     return decorator
 
+# Scrapers wrapped once with the configured retry policy
+_retry = retry_with_exponential_backoff(
+    max_retries=config['retry_config']['max_retries'],
+    base_delay=config['retry_config']['base_delay'],
+    max_delay=config['retry_config']['max_delay']
+)
+def _scrape_product_details_or_raise(url, **kwargs):
+    """
+    Scrape one product's details, raising on failure so the retry policy applies.
+
+    The scraper reports failures (429s included) as records with an 'error' key
+    instead of raising; those must neither be retried silently nor saved as products.
+    """
+    details = scrape_product_details(url, **kwargs)
+    if details and 'error' in details:
+        raise RuntimeError(f"Could not scrape product details for {url}: {details['error']}")
+    return details
+
+scrape_product_details_retry = _retry(_scrape_product_details_or_raise)
+scrape_reviews_retry = _retry(scrape_reviews)
+
+def _make_run_id(execution_date) -> str:
+    """Build the run identifier used to name this run's output files."""
+    return execution_date.strftime('%Y%m%d_%H%M%S')
+
+def _run_config_path(run_id: str) -> str:
+    """Path of the run configuration written by prepare_scraping."""
+    return f"data/{run_id}_runconfig.json"
+
+@lru_cache(maxsize=8)
+def _load_run_config(run_id: str) -> Dict[str, Any]:
+    """
+    Load the run configuration written by prepare_scraping.
+    
+    Cached per worker process so tasks don't each query XCom in the metadata DB.
+    
+    Args:
+        run_id: Run identifier built by _make_run_id
+        
+    Returns:
+        The run configuration dictionary
+    """
+    with open(_run_config_path(run_id), 'rb') as f:
+        return orjson.loads(f.read())
+
+# Buffer size for the streamed outputs: records are small, so batch them into large writes
+WRITE_BUFFER_SIZE = 1 << 20
+
+def _open_zstd_writer(path: str):
+    """
+    Open a zstd-compressed binary stream for writing, backed by a large write buffer.
+    
+    Args:
+        path: Output file path
+        
+    Returns:
+        Writable stream; closing it closes the underlying file
+    """
+    return zstandard.ZstdCompressor().stream_writer(open(path, 'wb', buffering=WRITE_BUFFER_SIZE))
+
+def _read_products_spool(spool_file: str, columns: List[str]) -> pa.Table:
+    """
+    Load the products spool (JSON Lines, zstd-compressed) into an Arrow table.
+    
+    Specification fields vary from product to product, so nothing is inferred: every column
+    is read as a string. Should a value still not fit (e.g. a number), the pandas reader
+    is used instead, with the same string columns.
+    
+    Args:
+        spool_file: Path of the spool written by process_product_details
+        columns: Every key found in the spooled records
+        
+    Returns:
+        Table with one string column per key
+    """
+    schema = pa.schema([(column, pa.string()) for column in columns])
+    try:
+        # The .zst is decompressed transparently
+        return pa_json.read_json(
+            spool_file,
+            parse_options=pa_json.ParseOptions(explicit_schema=schema,
+                                               unexpected_field_behavior='infer')
+        )
+    except pa.ArrowInvalid as e:
+        logger.warning(f"Arrow could not read the products spool, using pandas: {str(e)}")
+        products_df = pd.read_json(spool_file, lines=True, compression='zstd', dtype=False)
+        products_df = products_df.reindex(columns=columns).astype('string')
+        return pa.Table.from_pandas(products_df, schema=schema, preserve_index=False)
+
+# Schema of the per-category product URL files written by scrape_category
+CATEGORY_URLS_SCHEMA = pa.schema([('category', pa.string()), ('url', pa.string())])
+
+def _category_urls_path(run_id: str, category: str) -> str:
+    """Path of the Parquet file holding a category's product URLs."""
+    return f"data/{run_id}_category_{category}.parquet"
+
+def _iter_product_urls(product_urls) -> Iterator[str]:
+    """
+    Iterate over product URLs handed over by process_product_details.
+    
+    Args:
+        product_urls: List of URLs, or path of the file they were spilled to
+        
+    Returns:
+        Iterator over the URLs; a spill file is read line by line
+    """
+    if isinstance(product_urls, str):
+        with open(product_urls, 'r', encoding='utf-8') as f:
+            for line in f:
+                url = line.rstrip('\n')
+                if url:
+                    yield url
+    else:
+        yield from product_urls
+
+# Worker threads of the HTTP scraping tasks: never more than the pool slots a task can hold
+HTTP_TASK_WORKERS = min(config['max_workers'], HTTP_POOL_SLOTS)
+
+# Worker threads shared by every task run in this process, created on first use
+_EXECUTOR = None
+_EXECUTOR_LOCK = threading.Lock()
+
+def _get_executor() -> ThreadPoolExecutor:
+    """
+    Return the process-wide scraping thread pool, creating it on first use.
+    
+    Reused across tasks instead of spawning and joining a pool per task. Not capped at
+    the CPU count: the workers spend their time waiting on the network. Capped at the
+    HTTP pool slots the scraping tasks hold, one slot per thread.
+    
+    Returns:
+        The shared ThreadPoolExecutor
+    """
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(
+                max_workers=HTTP_TASK_WORKERS,
+                thread_name_prefix='amazon-scrape'
+            )
+            atexit.register(_EXECUTOR.shutdown)
+        return _EXECUTOR
+
+def _bounded_map(executor, func, items, window: int, *args):
+    """
+    Run func(item, *args) on the executor with at most `window` futures in flight.
+    
+    Items are pulled lazily and the window is refilled as futures complete, so memory
+    stays proportional to concurrency rather than to the number of items.
+    
+    Args:
+        executor: Executor to submit to
+        func: Callable taking an item as first argument
+        items: Iterable of items
+        window: Maximum number of submitted, not yet consumed futures
+        *args: Extra arguments passed to func
+        
+    Yields:
+        (item, future) pairs, in completion order
+    """
+    items = iter(items)
+    future_to_item = {}
+    next_items = islice(items, window)
+    while True:
+        for item in next_items:
+            future_to_item[executor.submit(func, item, *args)] = item
+        if not future_to_item:
+            return
+        
+        done, _ = wait(future_to_item, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield future_to_item.pop(future), future
+        
+        # Refill the window with as many items as futures just completed
+        next_items = islice(items, len(done))
+
 # Enhanced task function definitions
 @logger.airflow_task_logger('check_environment')
 def check_environment(**kwargs):
@@ -161,14 +367,12 @@ def check_environment(**kwargs):
                 os.makedirs(directory, exist_ok=True)
                 logger.info(f"Created directory: {directory}")
 
-        # Check required modules
+        # Check required modules (find_spec locates them without importing)
         required_modules = ['requests', 'bs4', 'pandas', 'selenium']
-        missing_modules = []
-        for module in required_modules:
-            try:
-                __import__(module)
-            except ImportError:
-                missing_modules.append(module)
+        missing_modules = [
+            module for module in required_modules
+            if importlib.util.find_spec(module) is None
+        ]
         
         if missing_modules:
             raise ImportError(f"Missing required modules: {', '.join(missing_modules)}")
@@ -192,7 +396,7 @@ def prepare_scraping(**kwargs):
         execution_date = kwargs['execution_date']
         
         # Create unique run ID
-        run_id = execution_date.strftime('%Y%m%d_%H%M%S')
+        run_id = _make_run_id(execution_date)
         
         # Validate categories
         categories = config['categories']
@@ -209,12 +413,13 @@ def prepare_scraping(**kwargs):
             'timestamp': execution_date.isoformat(),
             'output_files': {
                 'products': f"data/{run_id}_products.csv",
-                'reviews': f"data/{run_id}_reviews.json",
+                'products_parquet': f"data/{run_id}_products.parquet",
+                'products_spool': f"data/{run_id}_products.jsonl.zst",
+                'reviews': f"data/{run_id}_reviews.jsonl.zst",
                 'categories': f"data/{run_id}_categories.json"
             },
             'batch_size': config['batch_size'],
             'max_workers': config['max_workers'],
-            'rate_limit': config['rate_limit']
         }
         
         # Validate and create output files
@@ -223,13 +428,25 @@ def prepare_scraping(**kwargs):
             if not os.path.exists(directory):
                 os.makedirs(directory, exist_ok=True)
             
+            # Parquet files are binary and only written once there is data
+            if output_file.endswith('.parquet'):
+                continue
+            
+            # Compressed outputs get a valid empty zstd frame: a zero-byte file is not one
+            if output_file.endswith('.zst'):
+                with _open_zstd_writer(output_file):
+                    pass
+                continue
+            
             with open(output_file, 'w') as f:
                 if output_file.endswith('.json'):
                     f.write('{}')
-                elif output_file.endswith('.csv'):
+                elif output_file.endswith(('.csv', '.jsonl')):
                     f.write('')
         
-        # Push configuration to XCom
+        # Persist configuration for downstream tasks, and keep it in XCom for the UI
+        with open(_run_config_path(run_id), 'wb') as f:
+            f.write(orjson.dumps(run_config, option=JSON_DUMP_OPTIONS))
         ti.xcom_push(key='run_config', value=run_config)
         logger.info(f"Prepared scraping run: {run_id}")
         
@@ -240,19 +457,18 @@ def prepare_scraping(**kwargs):
 
 @logger.airflow_task_logger('scrape_category')
 @time_operation('category_scrape')
-@rate_limit(requests_per_second=2, burst_size=5)
+@rate_limit
 @retry_with_exponential_backoff(max_retries=5, base_delay=2, max_delay=30)
 def scrape_category(category, **kwargs):
     """Enhanced category scraping with rate limiting and retries."""
     try:
-        ti = kwargs['ti']
-        run_config = ti.xcom_pull(task_ids='prepare_scraping', key='run_config')
+        run_config = _load_run_config(_make_run_id(kwargs['execution_date']))
         
         logger.info(f"Starting scrape for category: {category}")
         logger.set_context(category=category, custom_data={'run_id': run_config['run_id']})
         
         metrics.increment(f'category.{category}.started')
-        metrics.start_timer(f'category_{category}')
+        start = time.perf_counter()
         
         result = scrape_amazon_filters(
             category=category,
@@ -261,7 +477,16 @@ def scrape_category(category, **kwargs):
             output_file=run_config['output_files']['categories']
         )
         
-        elapsed = metrics.stop_timer(f'category_{category}', 'category_scrape')
+        # Hand the category's product URLs to process_product_details as a Parquet file
+        product_urls = (result or {}).get('product_urls', [])
+        pq.write_table(
+            pa.table({'category': [category] * len(product_urls), 'url': product_urls},
+                     schema=CATEGORY_URLS_SCHEMA),
+            _category_urls_path(run_config['run_id'], category)
+        )
+        
+        elapsed = time.perf_counter() - start
+        metrics.record_time('category_scrape', elapsed)
         metrics.increment(f'category.{category}.completed')
         
         logger.info(f"Completed scrape for category {category} in {elapsed:.2f}s")
@@ -276,56 +501,91 @@ def scrape_category(category, **kwargs):
 def process_product_details(**kwargs):
     """Enhanced product details processing with parallel execution."""
     try:
-        ti = kwargs['ti']
-        run_config = ti.xcom_pull(task_ids='prepare_scraping', key='run_config')
-        
-        # Load category results
-        with open(run_config['output_files']['categories'], 'r') as f:
-            category_data = json.load(f)
-        
-        # Collect product URLs
-        product_urls = []
-        for category, data in category_data.items():
-            if 'product_urls' in data:
-                product_urls.extend(data['product_urls'])
-        
+        run_config = _load_run_config(_make_run_id(kwargs['execution_date']))
+        
+        # Collect product URLs, streaming only the url column of each category file.
+        # Products listed in several categories are scraped once (first category wins).
+        url_categories = {}
+        total_urls = 0
+        for category in run_config['categories']:
+            urls_path = _category_urls_path(run_config['run_id'], category)
+            if not os.path.exists(urls_path):
+                logger.warning(f"No product URLs for category {category}")
+                continue
+            for batch in pq.ParquetFile(urls_path).iter_batches(columns=['url']):
+                for url in batch.column('url').to_pylist():
+                    url_categories.setdefault(url, category)
+                    total_urls += 1
+        product_urls = list(url_categories)
+        
+        duplicate_urls = total_urls - len(product_urls)
+        if duplicate_urls:
+            metrics.increment('duplicate_product_urls', duplicate_urls)
+            logger.info(f"Deduped {duplicate_urls} duplicate URLs")
         logger.info(f"Found {len(product_urls)} products to scrape")
         metrics.set_gauge('total_products', len(product_urls))
         
-        # Process products in parallel
-        product_results = []
-        with ThreadPoolExecutor(max_workers=run_config['max_workers']) as executor:
-            future_to_url = {
-                executor.submit(
-                    retry_with_exponential_backoff(
-                        max_retries=config['retry_config']['max_retries'],
-                        base_delay=config['retry_config']['base_delay'],
-                        max_delay=config['retry_config']['max_delay']
-                    )(scrape_product_details),
-                    url
-                ): url for url in product_urls
-            }
-            
-            for future in as_completed(future_to_url):
-                url = future_to_url[future]
+        # One pooled session shared by all worker threads: connections to Amazon are kept alive
+        # 429s are not retried by the adapter (a retry would skip the token bucket):
+        # the details scraper penalizes the shared bucket instead
+        session = create_http_session(
+            status_forcelist=[500, 502, 503, 504],
+            pool_connections=run_config['max_workers'] * 4,
+            pool_maxsize=run_config['max_workers'] * 8
+        )
+        
+        # Each HTTP call is throttled by the scraper itself with the shared Amazon bucket: it
+        # reports failures (429s included) as error records instead of raising, so only it can
+        # back the bucket off on a 429.
+        fetch_details = partial(scrape_product_details_retry, session=session)
+        
+        # Process products in parallel, spooling each record to disk as it completes.
+        # The output files need the union of all keys, which is only known at the end.
+        spool_file = run_config['output_files']['products_spool']
+        scraped_urls = []
+        products_saved = 0
+        # Union of the product keys, in first-seen order, for the explicit spool schema
+        product_columns = {}
+        # The pooled session is closed even if the spool writer or a worker fails
+        with session, _open_zstd_writer(spool_file) as spool:
+            for url, future in _bounded_map(_get_executor(), fetch_details, product_urls,
+                                            run_config['max_workers'] * 4):
                 try:
                     product_data = future.result()
                     if product_data:
-                        product_results.append(product_data)
+                        # Category the URL was collected from, used by the product statistics
+                        product_data['category'] = url_categories[url]
+                        spool.write(orjson.dumps(product_data) + b'\n')
+                        product_columns.update(dict.fromkeys(product_data))
+                        scraped_urls.append(product_data.get('url', url))
+                        products_saved += 1
                         metrics.increment('products_scraped')
                 except Exception as e:
                     metrics.record_error('product_details')
                     logger.error(f"Error scraping product {url}: {str(e)}")
         
         # Save results
-        if product_results:
-            import pandas as pd
-            df = pd.DataFrame(product_results)
-            df.to_csv(run_config['output_files']['products'], index=False)
-            logger.info(f"Saved {len(product_results)} products to {run_config['output_files']['products']}")
-        
-        metrics.set_gauge('products_scraped', len(product_results))
-        return len(product_results)
+        if products_saved:
+            # Load the spool once into Arrow; the column set is the union of keys across all products
+            products_table = _read_products_spool(spool_file, list(product_columns))
+            
+            # CSV through Arrow's vectorized writer, plus a columnar copy for the statistics pass
+            pa_csv.write_csv(products_table, run_config['output_files']['products'],
+                             write_options=pa_csv.WriteOptions(batch_size=4096))
+            pq.write_table(products_table, run_config['output_files']['products_parquet'])
+            logger.info(f"Saved {products_saved} products to {run_config['output_files']['products']}")
+        
+        # Hand the scraped URLs to the reviews task; large lists are spilled to a file
+        if len(scraped_urls) > MAX_XCOM_URLS:
+            urls_file = f"data/{run_config['run_id']}_urls.txt"
+            with open(urls_file, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+                f.writelines(f"{url}\n" for url in scraped_urls)
+            kwargs['ti'].xcom_push(key='product_urls', value=urls_file)
+        else:
+            kwargs['ti'].xcom_push(key='product_urls', value=scraped_urls)
+        
+        metrics.set_gauge('products_scraped', products_saved)
+        return products_saved
     except Exception as e:
         metrics.record_error('process_product_details')
         logger.error(f"Error processing product details: {str(e)}")
@@ -333,102 +593,115 @@ def process_product_details(**kwargs):
 
 @logger.airflow_task_logger('scrape_reviews')
 @time_operation('reviews_scrape')
-@rate_limit(requests_per_second=2, burst_size=5)
 def process_reviews(**kwargs):
     """Enhanced review processing with rate limiting and parallel execution."""
     try:
-        ti = kwargs['ti']
-        run_config = ti.xcom_pull(task_ids='prepare_scraping', key='run_config')
+        run_config = _load_run_config(_make_run_id(kwargs['execution_date']))
         
-        # Load product data
-        try:
-            import pandas as pd
-            products_df = pd.read_csv(run_config['output_files']['products'])
-            product_urls = products_df['url'].tolist()
-        except Exception as e:
-            logger.warning(f"No product data found, skipping review scraping: {str(e)}")
+        # URLs of the scraped products: a list, or the path of the spill file
+        product_urls = kwargs['ti'].xcom_pull(task_ids='scrape_product_details', key='product_urls')
+        if not product_urls:
+            logger.warning("No product data found, skipping review scraping")
             return 0
         
-        logger.info(f"Found {len(product_urls)} products for review scraping")
-        metrics.set_gauge('total_products_for_reviews', len(product_urls))
-        
-        # Process reviews in parallel
-        all_reviews = []
-        with ThreadPoolExecutor(max_workers=run_config['max_workers']) as executor:
-            future_to_url = {
-                executor.submit(
-                    retry_with_exponential_backoff(
-                        max_retries=config['retry_config']['max_retries'],
-                        base_delay=config['retry_config']['base_delay'],
-                        max_delay=config['retry_config']['max_delay']
-                    )(scrape_reviews),
-                    url,
-                    config['max_reviews_per_product']
-                ): url for url in product_urls
-            }
-            
-            for future in as_completed(future_to_url):
-                url = future_to_url[future]
+        # The review scraper takes a token from the shared Amazon bucket for each page load
+        fetch_reviews = scrape_reviews_retry
+        
+        # Process reviews in parallel, streaming each review to disk as JSON Lines.
+        # URLs are read lazily and only a bounded window of futures is in flight.
+        total_reviews = 0
+        products_submitted = 0
+        with _open_zstd_writer(run_config['output_files']['reviews']) as reviews_file:
+            for url, future in _bounded_map(_get_executor(), fetch_reviews, _iter_product_urls(product_urls),
+                                            run_config['max_workers'] * 4,
+                                            config['max_reviews_per_product']):
+                products_submitted += 1
                 try:
                     reviews = future.result()
                     if reviews:
-                        all_reviews.extend(reviews)
+                        for review in reviews:
+                            reviews_file.write(orjson.dumps(review) + b'\n')
+                        total_reviews += len(reviews)
                         metrics.increment('reviews_scraped', len(reviews))
                 except Exception as e:
                     metrics.record_error('review_scrape')
                     logger.error(f"Error scraping reviews for {url}: {str(e)}")
         
-        # Save reviews
-        if all_reviews:
-            with open(run_config['output_files']['reviews'], 'w') as f:
-                json.dump(all_reviews, f, indent=2)
-            logger.info(f"Saved {len(all_reviews)} reviews to {run_config['output_files']['reviews']}")
-        
-        metrics.set_gauge('total_reviews', len(all_reviews))
-        return len(all_reviews)
+        metrics.set_gauge('total_products_for_reviews', products_submitted)
+        logger.info(f"Saved {total_reviews} reviews for {products_submitted} products "
+                    f"to {run_config['output_files']['reviews']}")
+        metrics.set_gauge('total_reviews', total_reviews)
+        return total_reviews
     except Exception as e:
         metrics.record_error('process_reviews')
         logger.error(f"Error processing reviews: {str(e)}")
         raise
 
-@logger.airflow_task_logger('post_process_data')
-def post_process_data(**kwargs):
-    """Enhanced post-processing with better data validation and error handling."""
+@logger.airflow_task_logger('post_process_and_report')
+def post_process_and_report(**kwargs):
+    """Compute run statistics and write the statistics and reports in a single task."""
     try:
-        ti = kwargs['ti']
-        run_config = ti.xcom_pull(task_ids='prepare_scraping', key='run_config')
+        run_config = _load_run_config(_make_run_id(kwargs['execution_date']))
         
         logger.info("Starting post-processing of scraped data")
         
         # Load and validate data
         try:
-            import pandas as pd
-            products_df = pd.read_csv(run_config['output_files']['products'])
+            products_file = run_config['output_files']['products_parquet']
+            # Product columns come from each page's specification table: price may be absent
+            has_price = 'price' in pq.read_schema(products_file).names
+            products_table = pq.read_table(
+                products_file,
+                columns=['category', 'price'] if has_price else ['category']
+            )
             
-            # Calculate product statistics
             product_stats = {
-                'total_products': len(products_df),
-                'categories': products_df['category'].value_counts().to_dict(),
-                'price_stats': {
-                    'min': products_df['price'].min(),
-                    'max': products_df['price'].max(),
-                    'mean': products_df['price'].mean(),
-                    'median': products_df['price'].median()
+                'total_products': products_table.num_rows,
+                'categories': {
+                    entry['values']: entry['counts']
+                    for entry in pc.value_counts(products_table['category']).to_pylist()
                 }
             }
+            
+            # Calculate price statistics on the Arrow column (min and max in one pass)
+            price_type = products_table.schema.field('price').type if has_price else None
+            if price_type is not None and (pa.types.is_integer(price_type) or pa.types.is_floating(price_type)):
+                prices = products_table['price']
+                price_range = pc.min_max(prices)
+                product_stats['price_stats'] = {
+                    'min': price_range['min'].as_py(),
+                    'max': price_range['max'].as_py(),
+                    'mean': pc.mean(prices).as_py(),
+                    'median': pc.quantile(prices, q=0.5, interpolation='linear')[0].as_py()
+                }
         except Exception as e:
             logger.warning(f"Could not calculate product statistics: {str(e)}")
             product_stats = {}
         
         # Load and process reviews
         try:
-            with open(run_config['output_files']['reviews'], 'r') as f:
-                reviews = json.load(f)
+            # Vectorized per chunk: only the row total and the rating counts are kept between chunks
+            total_reviews = 0
+            rating_counts = pd.Series(dtype='int64')
+            reader = pd.read_json(
+                run_config['output_files']['reviews'],
+                lines=True,
+                compression='zstd',
+                dtype={'rating': 'float32'},
+                chunksize=100_000
+            )
+            with reader:
+                for chunk in reader:
+                    # Every review counts, including those without a rating
+                    total_reviews += len(chunk)
+                    rating_counts = rating_counts.add(chunk['rating'].value_counts(), fill_value=0)
             
+            # The average only covers the reviews that have a rating
+            rated_reviews = int(rating_counts.sum())
             review_stats = {
-                'total_reviews': len(reviews),
-                'average_rating': sum(r['rating'] for r in reviews) / len(reviews) if reviews else 0,
-                'rating_distribution': pd.Series([r['rating'] for r in reviews]).value_counts().to_dict()
+                'total_reviews': total_reviews,
+                'average_rating': float((rating_counts.index.to_numpy() * rating_counts.to_numpy()).sum() / rated_reviews) if rated_reviews else 0,
+                'rating_distribution': rating_counts.sort_values(ascending=False).astype('int64').to_dict()
             }
         except Exception as e:
             logger.warning(f"Could not calculate review statistics: {str(e)}")
@@ -444,27 +717,13 @@ def post_process_data(**kwargs):
         
         # Save statistics
         stats_file = f"data/{run_config['run_id']}_statistics.json"
-        with open(stats_file, 'w') as f:
-            json.dump(statistics, f, indent=2)
+        with open(stats_file, 'wb') as f:
+            f.write(orjson.dumps(statistics, option=JSON_DUMP_OPTIONS))
         
-        logger.info(f"Generated statistics: {json.dumps(review_stats)}")
-        return True
-    except Exception as e:
-        metrics.record_error('post_process_data')
-        logger.error(f"Error in post-processing: {str(e)}")
-        raise
-
-@logger.airflow_task_logger('generate_report')
-def generate_report(**kwargs):
-    """Enhanced report generation with better formatting and error handling."""
-    try:
-        ti = kwargs['ti']
-        run_config = ti.xcom_pull(task_ids='prepare_scraping', key='run_config')
+        # Single XCom push for all statistics of the run
+        kwargs['ti'].xcom_push(key='scraping_stats', value=statistics)
         
-        # Load statistics
-        stats_file = f"data/{run_config['run_id']}_statistics.json"
-        with open(stats_file, 'r') as f:
-            statistics = json.load(f)
+        logger.info(f"Generated statistics: {orjson.dumps(review_stats, option=orjson.OPT_NON_STR_KEYS).decode()}")
         
         # Generate JSON report
         report = {
@@ -477,8 +736,8 @@ def generate_report(**kwargs):
         
         # Save JSON report
         json_report_file = f"data/{run_config['run_id']}_report.json"
-        with open(json_report_file, 'w') as f:
-            json.dump(report, f, indent=2)
+        with open(json_report_file, 'wb') as f:
+            f.write(orjson.dumps(report, option=JSON_DUMP_OPTIONS))
         logger.info(f"Generated report: {json_report_file}")
         
         # Generate text report
@@ -514,14 +773,14 @@ Output Files:
         
         # Save text report
         text_report_file = f"data/{run_config['run_id']}_report.txt"
-        with open(text_report_file, 'w') as f:
+        with open(text_report_file, 'w', encoding='utf-8') as f:
             f.write(text_report)
         logger.info(f"Generated text report: {text_report_file}")
         
         return True
     except Exception as e:
-        metrics.record_error('generate_report')
-        logger.error(f"Error generating report: {str(e)}")
+        metrics.record_error('post_process_and_report')
+        logger.error(f"Error in post-processing: {str(e)}")
         raise
 
 @logger.airflow_task_logger('run_full_scraping')
@@ -529,11 +788,10 @@ Output Files:
 def execute_full_scrape(**kwargs):
     """Enhanced full scraping execution with better error handling and monitoring."""
     try:
-        ti = kwargs['ti']
-        run_config = ti.xcom_pull(task_ids='prepare_scraping', key='run_config')
+        run_config = _load_run_config(_make_run_id(kwargs['execution_date']))
         
         logger.info("Starting full scraping process")
-        metrics.start_timer('full_scrape')
+        start = time.perf_counter()
         
         # Execute the full scrape
         result = run_full_scrape(
@@ -544,7 +802,8 @@ def execute_full_scrape(**kwargs):
         )
         
         # Record completion
-        elapsed = metrics.stop_timer('full_scrape', 'full_scrape')
+        elapsed = time.perf_counter() - start
+        metrics.record_time('full_scrape', elapsed)
         logger.info(f"Full scraping completed successfully in {elapsed:.2f}s")
         
         return True
@@ -559,31 +818,33 @@ with dag:
     check_env = PythonOperator(
         task_id='check_environment',
         python_callable=check_environment,
-        provide_context=True
+        provide_context=True,
+        pool=CPU_POOL
     )
     
     prepare = PythonOperator(
         task_id='prepare_scraping',
         python_callable=prepare_scraping,
-        provide_context=True
+        provide_context=True,
+        pool=CPU_POOL,
+        do_xcom_push=False  # run_config is pushed explicitly under its own key
     )
     
-    # Category scraping tasks
-    with TaskGroup(group_id='scrape_categories') as category_group:
-        category_tasks = {}
-        for category in config['categories']:
-            category_tasks[category] = PythonOperator(
-                task_id=f'scrape_category_{category}',
-                python_callable=scrape_category,
-                op_kwargs={'category': category},
-                provide_context=True
-            )
+    # Category scraping: one operator mapped over the categories at runtime
+    category_tasks = PythonOperator.partial(
+        task_id='scrape_category',
+        python_callable=scrape_category,
+        pool=HTTP_POOL
+    ).expand(op_kwargs=[{'category': category} for category in config['categories']])
     
     # Product details task
     product_details = PythonOperator(
         task_id='scrape_product_details',
         python_callable=process_product_details,
-        provide_context=True
+        provide_context=True,
+        pool=HTTP_POOL,
+        # One slot per worker thread so the pool caps concurrent connections to Amazon
+        pool_slots=HTTP_TASK_WORKERS
     )
     
     # Reviews task
@@ -591,28 +852,26 @@ with dag:
         task_id='scrape_reviews',
         python_callable=process_reviews,
         provide_context=True,
+        pool=HTTP_POOL,
+        pool_slots=HTTP_TASK_WORKERS,
         trigger_rule=TriggerRule.ALL_SUCCESS
     )
     
-    # Post-processing task
+    # Post-processing and report generation task
     post_process = PythonOperator(
-        task_id='post_process_data',
-        python_callable=post_process_data,
-        provide_context=True
-    )
-    
-    # Report generation task
-    generate = PythonOperator(
-        task_id='generate_report',
-        python_callable=generate_report,
-        provide_context=True
+        task_id='post_process_and_report',
+        python_callable=post_process_and_report,
+        provide_context=True,
+        pool=CPU_POOL,
+        do_xcom_push=False  # statistics are pushed explicitly under 'scraping_stats'
     )
     
     # Completion task
-    completion = DummyOperator(
+    completion = EmptyOperator(
         task_id='completion',
+        pool=CPU_POOL,
         trigger_rule=TriggerRule.ALL_SUCCESS
     )
     
     # Set task dependencies
-    check_env >> prepare >> category_group >> product_details >> reviews >> post_process >> generate >> completion
\ No newline at end of file
+    check_env >> prepare >> category_tasks >> product_details >> reviews >> post_process >> completion
\ No newline at end of file
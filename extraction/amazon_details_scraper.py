@@ -1,20 +1,53 @@
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bs4 import BeautifulSoup, SoupStrainer
 import pandas as pd
-import time
-import random
 import os
+import re
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from utils.token_bucket import get_amazon_bucket, is_rate_limited_error, RATE_LIMIT_PENALTY_SECONDS
+from utils.file_utils import append_dicts_csv
+
+# Table des spécifications techniques : seul ce sous-arbre est construit lors du parsing
+TECH_TABLE_ID = 'productDetails_techSpec_section_1'
+TECH_TABLE_STRAINER = SoupStrainer(id=TECH_TABLE_ID)
+
+# Suite quelconque d'espaces / retours à la ligne, réduite à un seul espace
+_WS = re.compile(r'\s+')
+
+# Colonnes du fichier des produits lues pour l'extraction
+PRODUCT_COLUMNS = ['asin', 'url', 'titre']
+
+# Timeout (connexion, lecture) des requêtes produit
+REQUEST_TIMEOUT = (5, 15)
+
+# Produits en échec : retentés lors d'une exécution suivante, après un délai et
+# dans la limite de MAX_ATTEMPTS tentatives
+FAILURE_COLUMNS = ['asin', 'url', 'error', 'last_attempt', 'attempts']
+MAX_ATTEMPTS = 3
+RETRY_DELAY = timedelta(hours=1)
 
 class AmazonDetailsScraper:
-    def __init__(self, products_file='amazon_products_all.csv'):
+    def __init__(self, products_file='amazon_products_all.csv', session=None, max_workers=4,
+                 rate_limiter=None):
         """
         Initialisation du scraper Amazon pour les détails techniques des produits.
 
         Args:
             products_file (str): Fichier CSV contenant les produits à analyser.
+            session (requests.Session, optional): Session HTTP partagée (connexions réutilisées).
+            max_workers (int): Nombre de produits extraits en parallèle.
+            rate_limiter (TokenBucket, optional): Limiteur de débit (par défaut : le quota Amazon partagé).
         """
         self.products_file = products_file
+        self.max_workers = max_workers
+        self.rate_limiter = rate_limiter if rate_limiter is not None else get_amazon_bucket()
+        self.session = session if session is not None else self._create_session()
         self.details_file = 'product_information.csv'
+        self.failures_file = 'product_failures.csv'
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36',
             'Accept-Language': 'fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7',
@@ -23,6 +56,32 @@ class AmazonDetailsScraper:
             'Referer': 'https://www.amazon.co.uk/'
         }
 
+    def _create_session(self):
+        """
+        Créer une session HTTP avec connexions persistantes (keep-alive) et relances.
+
+        Les réponses 5xx sont relancées avec backoff exponentiel, en respectant l'en-tête
+        Retry-After envoyé par Amazon. Les 429 ne sont pas relancées ici (une relance ne
+        prendrait pas de jeton) : elles pénalisent le quota partagé dans extract_technical_details.
+
+        Returns:
+            requests.Session: Session configurée.
+        """
+        session = requests.Session()
+        session.mount('https://', HTTPAdapter(
+            pool_connections=16,
+            pool_maxsize=max(16, self.max_workers),
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.5,
+                status_forcelist=[500, 502, 503, 504],
+                respect_retry_after_header=True,
+                # Rendre la dernière réponse pour que raise_for_status signale l'erreur
+                raise_on_status=False
+            )
+        ))
+        return session
+
     def extract_technical_details(self, url, asin, titre):
         """
         Extraire les détails techniques d'un produit.
@@ -36,41 +95,42 @@ class AmazonDetailsScraper:
             dict: Détails techniques du produit.
         """
         try:
-            # Pause aléatoire pour éviter d'être bloqué
-            time.sleep(random.uniform(2, 5))
+            # Attendre un jeton du limiteur de débit au lieu d'une pause fixe
+            self.rate_limiter.acquire()
 
             print(f"Extraction des détails pour: {titre} (ASIN: {asin})")
 
             # Faire la requête à la page du produit
-            response = requests.get(url, headers=self.headers)
+            response = self.session.get(url, headers=self.headers, timeout=REQUEST_TIMEOUT)
             response.raise_for_status()
 
-            # Analyser le HTML
-            soup = BeautifulSoup(response.content, 'html.parser')
+            # Analyser le HTML (parser lxml en C, limité à la table des spécifications ;
+            # Amazon sert ses pages en UTF-8, inutile de détecter l'encodage)
+            soup = BeautifulSoup(response.content, 'lxml', parse_only=TECH_TABLE_STRAINER,
+                                 from_encoding='utf-8')
 
             # Initialiser un dictionnaire pour stocker les détails techniques
             tech_details = {'asin': asin, 'titre': titre, 'url': url}
 
             # Trouver la table des spécifications techniques
-            tech_table = soup.select_one('#productDetails_techSpec_section_1')
+            tech_table = soup.find(id=TECH_TABLE_ID)
 
             if tech_table:
                 # Extraire toutes les lignes de la table
-                rows = tech_table.select('tr')
+                rows = tech_table.find_all('tr')
 
                 for row in rows:
                     # Extraire l'en-tête et la valeur
-                    header = row.select_one('th')
-                    value = row.select_one('td')
+                    header = row.find('th')
+                    value = row.find('td')
 
                     if header and value:
                         # Nettoyer le texte
-                        header_text = header.text.strip().replace('\n', ' ').replace('  ', ' ')
-                        value_text = value.text.strip().replace('\n', ' ').replace('  ', ' ')
+                        header_text = _WS.sub(' ', header.text).strip()
+                        value_text = _WS.sub(' ', value.text).strip()
 
-                        # Enlever les caractères de formatage ajoutés par Amazon
-                        if value_text.startswith('‎'):
-                            value_text = value_text[1:]
+                        # Enlever les caractères de formatage (marque LRM) ajoutés par Amazon
+                        value_text = value_text.lstrip('\u200e')
 
                         # Ajouter au dictionnaire
                         tech_details[header_text] = value_text
@@ -80,9 +140,69 @@ class AmazonDetailsScraper:
             return tech_details
 
         except Exception as e:
+            if is_rate_limited_error(e):
+                # Ralentir tous les threads, pendant la durée demandée par Amazon si elle est fournie
+                retry_after = e.response.headers.get('Retry-After', '')
+                self.rate_limiter.penalize(
+                    float(retry_after) if retry_after.isdigit() else RATE_LIMIT_PENALTY_SECONDS
+                )
             print(f"Erreur lors de l'extraction des détails pour ASIN {asin}: {e}")
             return {'asin': asin, 'titre': titre, 'url': url, 'error': str(e)}
 
+    def _load_failures(self):
+        """
+        Charger les échecs d'extraction des exécutions précédentes.
+
+        Returns:
+            dict: {asin: {'url', 'error', 'last_attempt', 'attempts'}}.
+        """
+        if not os.path.exists(self.failures_file):
+            return {}
+
+        try:
+            failures = pd.read_csv(self.failures_file,
+                                   dtype={'asin': str, 'last_attempt': str, 'attempts': 'Int64'})
+            return failures.drop_duplicates(subset='asin', keep='last').set_index('asin').to_dict(orient='index')
+        except Exception as e:
+            print(f"Erreur lors de la lecture du fichier des échecs: {e}")
+            return {}
+
+    def _is_blocked(self, failure, now):
+        """
+        Indiquer si un échec ne doit pas encore être retenté.
+
+        Une ligne incomplète ou illisible (tentatives ou date manquantes, date invalide)
+        est considérée comme à retenter plutôt que d'interrompre l'exécution.
+
+        Args:
+            failure (dict): {'url', 'error', 'last_attempt', 'attempts'}.
+            now (datetime): Heure de référence.
+
+        Returns:
+            bool: True si l'ASIN a épuisé ses tentatives ou a échoué trop récemment.
+        """
+        attempts = failure.get('attempts')
+        if not pd.isna(attempts) and attempts >= MAX_ATTEMPTS:
+            return True
+
+        last_attempt = failure.get('last_attempt')
+        if pd.isna(last_attempt):
+            return False
+        try:
+            return now - datetime.fromisoformat(last_attempt) < RETRY_DELAY
+        except ValueError:
+            return False
+
+    def _save_failures(self, failures):
+        """
+        Enregistrer les échecs d'extraction (fichier de petite taille, réécrit en entier).
+
+        Args:
+            failures (dict): {asin: {'url', 'error', 'last_attempt', 'attempts'}}.
+        """
+        rows = [{'asin': asin, **failure} for asin, failure in failures.items()]
+        pd.DataFrame(rows, columns=FAILURE_COLUMNS).to_csv(self.failures_file, index=False, encoding='utf-8')
+
     def get_all_technical_details(self):
         """
         Extraire les détails techniques pour tous les produits du fichier CSV,
@@ -92,85 +212,110 @@ class AmazonDetailsScraper:
             bool: True si l'extraction s'est terminée avec succès, False sinon.
         """
         try:
-            # Lire le fichier CSV contenant les URLs
-            df = pd.read_csv(self.products_file)
+            # Lire le fichier CSV contenant les URLs (uniquement les colonnes utilisées)
+            df = pd.read_csv(self.products_file, usecols=PRODUCT_COLUMNS, dtype=str)
 
             # Vérifier si le fichier de détails existe déjà
             already_processed_asins = set()
             if os.path.exists(self.details_file):
                 try:
-                    # Charger les données existantes
-                    existing_details = pd.read_csv(self.details_file)
-                    # Récupérer les ASINs déjà traités
-                    if 'asin' in existing_details.columns:
-                        already_processed_asins = set(existing_details['asin'].dropna().unique())
-                        print(f"{len(already_processed_asins)} produits déjà traités trouvés dans le fichier existant.")
-                    
-                    # Charger toutes les données existantes pour les conserver
-                    all_technical_details = existing_details.to_dict('records')
+                    # Récupérer les ASINs déjà traités avec succès (les nouvelles lignes sont
+                    # ajoutées à la suite du fichier, le reste des données n'est pas chargé)
+                    existing = pd.read_csv(self.details_file, usecols=lambda column: column in ('asin', 'error'),
+                                           dtype=str)
+                    if 'error' in existing.columns:
+                        # Lignes d'erreur écrites par les anciennes versions : à retenter
+                        existing = existing[existing['error'].isna()]
+                    already_processed_asins = set(existing['asin'].dropna().unique())
+                    print(f"{len(already_processed_asins)} produits déjà traités trouvés dans le fichier existant.")
                 except Exception as e:
+                    # Ne jamais supprimer les détails déjà extraits : le fichier est mis de côté
+                    backup_file = f"{self.details_file}.{datetime.now():%Y%m%d%H%M%S}.bak"
                     print(f"Erreur lors de la lecture du fichier existant: {e}")
-                    print("Création d'un nouveau fichier de détails.")
-                    all_technical_details = []
-            else:
-                all_technical_details = []
+                    print(f"Fichier existant conservé sous {backup_file}, création d'un nouveau fichier de détails.")
+                    os.replace(self.details_file, backup_file)
+
+            # Détails extraits en attente d'écriture
+            pending_details = []
+
+            # Écarter les échecs récents ou ayant épuisé leurs tentatives
+            failures = self._load_failures()
+            now = datetime.now()
+            blocked_asins = {asin for asin, failure in failures.items() if self._is_blocked(failure, now)}
+            if failures:
+                print(f"{len(failures)} produits en échec, dont {len(failures) - len(blocked_asins)} à retenter.")
 
             # Nombre total de produits à traiter
             total_products = len(df)
             print(f"Nombre total de produits dans le fichier source: {total_products}")
             
-            # Filtrer les produits qui n'ont pas encore été traités
-            to_process = df[~df['asin'].isin(already_processed_asins)]
+            # Écarter en une passe vectorisée les données manquantes, les produits déjà
+            # traités et les doublons (une seule extraction par ASIN)
+            missing = df['asin'].eq("ASIN non disponible") | df['url'].eq("URL non disponible")
+            if missing.any():
+                print(f"{int(missing.sum())} produits avec des données manquantes, on les saute")
+            skipped = df['asin'].isin(already_processed_asins) | df['asin'].isin(blocked_asins)
+            to_process = df.loc[~missing & ~skipped, PRODUCT_COLUMNS]
+            to_process = to_process.drop_duplicates(subset='asin')
             remaining_products = len(to_process)
             print(f"Nombre de produits restants à traiter: {remaining_products}")
 
             # Compter le nombre de produits traités dans cette session
             processed_this_session = 0
 
-            # Pour chaque URL dans le fichier CSV qui n'a pas encore été traitée
-            for index, row in to_process.iterrows():
-                try:
-                    asin = row['asin']
-                    url = row['url']
-                    titre = row['titre']
-
-                    if asin == "ASIN non disponible" or url == "URL non disponible":
-                        print(f"Données manquantes pour le produit à l'index {index}, on le saute")
-                        continue
-                        
-                    # Vérifier encore une fois si l'ASIN est déjà traité (double vérification)
-                    if asin in already_processed_asins:
-                        print(f"ASIN {asin} déjà traité, on le saute")
+            # Tuples simples (index, asin, url, titre) plutôt que des Series par ligne
+            products = to_process.itertuples(index=True, name=None)
+
+            # Extraire les détails techniques en parallèle ; les résultats et les
+            # sauvegardes restent gérés dans ce thread
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {
+                    executor.submit(self.extract_technical_details, url, asin, titre): (index, asin)
+                    for index, asin, url, titre in products
+                }
+
+                for future in as_completed(futures):
+                    index, asin = futures[future]
+                    try:
+                        tech_details = future.result()
+
+                        # Ajouter aux lignes à écrire et marquer comme traité ; un échec est
+                        # enregistré à part pour être retenté plus tard
+                        if tech_details and 'error' not in tech_details:
+                            pending_details.append(tech_details)
+                            already_processed_asins.add(asin)
+                            failures.pop(asin, None)
+                        elif tech_details:
+                            previous_attempts = failures.get(asin, {}).get('attempts')
+                            failures[asin] = {
+                                'url': tech_details['url'],
+                                'error': tech_details['error'],
+                                'last_attempt': datetime.now().isoformat(timespec='seconds'),
+                                'attempts': (0 if pd.isna(previous_attempts) else int(previous_attempts)) + 1
+                            }
+
+                        # Mettre à jour le compteur
+                        processed_this_session += 1
+
+                        # Afficher la progression
+                        if processed_this_session % 10 == 0 or processed_this_session == remaining_products:
+                            print(f"Progression: {processed_this_session}/{remaining_products} produits traités dans cette session "
+                                  f"({(processed_this_session/remaining_products)*100:.2f}%)")
+
+                            # Sauvegarder régulièrement : seules les nouvelles lignes sont ajoutées
+                            if append_dicts_csv(pending_details, self.details_file):
+                                pending_details = []
+                                print(f"Sauvegarde effectuée dans {self.details_file}")
+                            self._save_failures(failures)
+
+                    except Exception as e:
+                        print(f"Erreur lors du traitement de l'index {index}: {e}")
                         continue
 
-                    # Extraire les détails techniques
-                    tech_details = self.extract_technical_details(url, asin, titre)
-
-                    # Ajouter à la liste et marquer comme traité
-                    if tech_details:
-                        all_technical_details.append(tech_details)
-                        already_processed_asins.add(asin)
-
-                    # Mettre à jour le compteur
-                    processed_this_session += 1
-
-                    # Afficher la progression
-                    if processed_this_session % 10 == 0 or processed_this_session == remaining_products:
-                        print(f"Progression: {processed_this_session}/{remaining_products} produits traités dans cette session "
-                              f"({(processed_this_session/remaining_products)*100:.2f}%)")
-
-                        # Sauvegarder les données régulièrement
-                        df_tech = pd.DataFrame(all_technical_details)
-                        df_tech.to_csv(self.details_file, index=False, encoding='utf-8')
-                        print(f"Sauvegarde effectuée dans {self.details_file}")
-
-                except Exception as e:
-                    print(f"Erreur lors du traitement de l'index {index}: {e}")
-                    continue
-
-            # Sauvegarder le fichier final
-            df_tech = pd.DataFrame(all_technical_details)
-            df_tech.to_csv(self.details_file, index=False, encoding='utf-8')
+            # Sauvegarder les dernières lignes
+            self._save_failures(failures)
+            if not append_dicts_csv(pending_details, self.details_file):
+                return False
 
             total_processed = len(already_processed_asins)
             print(f"Extraction terminée! {processed_this_session} produits traités dans cette session.")
@@ -202,19 +347,21 @@ class AmazonDetailsScraper:
 
         return success
 
-def scrape_product_details(url):
+def scrape_product_details(url, session=None, rate_limiter=None):
     """
     Extract product details from a single Amazon product URL.
     
     Args:
         url (str): The URL of the Amazon product page.
+        session (requests.Session, optional): Shared HTTP session to reuse connections.
+        rate_limiter (TokenBucket, optional): Rate limiter (default: the shared Amazon bucket).
         
     Returns:
         dict: A dictionary containing the product details.
     """
     try:
         # Create a temporary instance of the scraper
-        scraper = AmazonDetailsScraper()
+        scraper = AmazonDetailsScraper(session=session, rate_limiter=rate_limiter)
         
         # Extract ASIN from URL
         asin = None
@@ -1,12 +1,97 @@
 import requests
-from bs4 import BeautifulSoup
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import lxml.html
+from lxml import etree
+import orjson
 import time
 import re
+import logging
+import os
+import sys
+import threading
+
+try:
+    from requests_cache import CachedSession
+except ImportError:  # Cache optionnel : sans requests-cache, session HTTP classique
+    CachedSession = None
+
+logger = logging.getLogger(__name__)
+
+BASE_URL = "https://www.amazon.co.uk"
+
+# En-têtes pour imiter un navigateur (nécessaire pour éviter les blocages)
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Connection': 'keep-alive',
+}
+
+# Cache HTTP sur disque (SQLite, dans data/) : une page de filtres déjà téléchargée depuis
+# moins d'une heure est relue localement au lieu d'être redemandée à Amazon
+CACHE_DIR = 'data'
+CACHE_NAME = os.path.join(CACHE_DIR, 'amazon_cache')
+CACHE_EXPIRE_SECONDS = 3600
+
+# Session partagée, créée au premier appel de get_session() (et non à l'import du module,
+# que le DAG importe à chaque analyse du scheduler)
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+def get_session():
+    """Retourne la session partagée (réutilise les connexions TCP/TLS entre les catégories)."""
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            if CachedSession is not None:
+                os.makedirs(CACHE_DIR, exist_ok=True)
+                session = CachedSession(
+                    CACHE_NAME,
+                    backend='sqlite',
+                    expire_after=CACHE_EXPIRE_SECONDS,
+                    allowable_methods=['GET'],
+                    cache_control=True
+                )
+            else:
+                session = requests.Session()
+            session.headers.update(HEADERS)
+            session.mount('https://', HTTPAdapter(
+                pool_connections=20,
+                pool_maxsize=50,
+                max_retries=Retry(total=3, backoff_factor=0.5)
+            ))
+            _SESSION = session
+        return _SESSION
+
+REQUEST_TIMEOUT = 30
+
+# Paires clé:valeur des filtres dans le paramètre rh (compilée une seule fois)
+_FILTER_RE = re.compile(r'([pn]_[^:,]+):([^,]+)')
+
+def _has_class(name):
+    """Condition XPath équivalente au sélecteur CSS '.name'."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+# Requêtes XPath compilées une seule fois (évaluées par libxml2, en C)
+_XP_CATEGORY_TITLES = etree.XPath('//span[@class="a-size-base a-color-base puis-bold-weight-text"]')
+_XP_SECTION = etree.XPath(f'ancestor::div[{_has_class("a-section")}][1]')
+# Première liste après le début de l'élément, descendants compris (comme find_next)
+_XP_NEXT_LIST = etree.XPath(
+    f'(descendant::ul[{_has_class("a-unordered-list")}] | following::ul[{_has_class("a-unordered-list")}])[1]'
+)
+_XP_LIST_ITEMS = etree.XPath(f'.//span[{_has_class("a-list-item")}]')
+_XP_ITEM_LINK = etree.XPath('.//a[@class="a-link-normal s-navigation-item"][1]')
+_XP_VALUE_SPAN = etree.XPath('.//span[@class="a-size-base a-color-base"][1]')
+
+def _first(xpath, element):
+    """Premier résultat d'une requête XPath, ou None."""
+    nodes = xpath(element)
+    return nodes[0] if nodes else None
 
 def scrape_amazon_filters(category=None, max_pages=5, max_products=100, output_file='amazon_filters.json'):
     # URL de la page Amazon à scraper
-    base_url = "https://www.amazon.co.uk/s"
+    base_url = f"{BASE_URL}/s"
     params = {
         'i': category if category else 'computers',
         'rh': 'n%3A429886031',
@@ -15,23 +100,19 @@ def scrape_amazon_filters(category=None, max_pages=5, max_products=100, output_f
     }
     url = f"{base_url}?{'&'.join(f'{k}={v}' for k, v in params.items())}"
     
-    # En-têtes pour imiter un navigateur (nécessaire pour éviter les blocages)
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Accept-Language': 'en-US,en;q=0.9',
-        'Accept-Encoding': 'gzip, deflate, br',
-        'Connection': 'keep-alive',
-    }
+    # Filtres déjà présents dans l'URL de base (calculés une seule fois)
+    base_rh = url.split('rh=')[1].split('&')[0].replace('%3A', ':').replace('%2C', ',')
+    base_filters = frozenset(_FILTER_RE.findall(base_rh))
     
     try:
         # Faire la requête HTTP
         print(f"Envoi de la requête à Amazon UK pour la catégorie {category}...")
-        response = requests.get(url, headers=headers)
+        response = get_session().get(url, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
         print("Requête réussie, analyse du HTML...")
         
-        # Parser le HTML avec BeautifulSoup
-        soup = BeautifulSoup(response.content, 'html.parser')
+        # Parser le HTML avec lxml (pages servies en UTF-8 : pas de détection d'encodage)
+        tree = lxml.html.fromstring(response.content, parser=lxml.html.HTMLParser(encoding='utf-8'))
         
         # Dictionnaire pour stocker toutes les catégories et leurs valeurs
         filtered_data = {
@@ -41,22 +122,19 @@ def scrape_amazon_filters(category=None, max_pages=5, max_products=100, output_f
         }
         
         # Trouver tous les titres de catégories avec la classe spécifique
-        category_titles = soup.find_all('span', class_='a-size-base a-color-base puis-bold-weight-text')
+        category_titles = _XP_CATEGORY_TITLES(tree)
         
         # Initialiser la liste pour stocker les sections de filtres
         filter_sections = []
         
         # Pour chaque titre de catégorie, trouver la section associée
         for title_span in category_titles:
-            category_name = title_span.text.strip()
+            category_name = title_span.text_content().strip()
             
-            # Trouver le parent contenant le titre et les valeurs
-            parent_section = title_span
-            # Remonter jusqu'à trouver le div de la section complète
-            while parent_section and not (parent_section.name == 'div' and 'a-section' in parent_section.get('class', [])):
-                parent_section = parent_section.parent
+            # Trouver le parent contenant le titre et les valeurs : le div a-section le plus proche
+            parent_section = _first(_XP_SECTION, title_span)
             
-            if parent_section:
+            if parent_section is not None:
                 filter_sections.append({
                     'name': category_name,
                     'section': parent_section
@@ -77,34 +155,31 @@ def scrape_amazon_filters(category=None, max_pages=5, max_products=100, output_f
             if i < len(filter_sections) - 1:
                 next_section = filter_sections[i + 1]['section']
             
-            # Chercher d'abord la liste ul qui contient les valeurs
-            ul_element = None
-            # Parcourir les éléments suivants de la section actuelle
-            for sibling in section.find_all_next():
-                # Si on atteint la section suivante, on s'arrête
-                if next_section and sibling == next_section:
-                    break
-                # Si on trouve une liste ul, c'est probablement celle qui contient nos valeurs
-                if sibling.name == 'ul' and 'a-unordered-list' in sibling.get('class', []):
-                    ul_element = sibling
-                    break
+            # Chercher d'abord la liste ul qui contient les valeurs : la première liste
+            # après la section actuelle (un seul saut en avant, sans parcourir le reste du document)
+            ul_element = _first(_XP_NEXT_LIST, section)
+            # Si cette liste se trouve après le début de la section suivante, elle lui appartient :
+            # la première liste après la section suivante est alors la même
+            if ul_element is not None and next_section is not None and next_section is not section \
+                    and _first(_XP_NEXT_LIST, next_section) is ul_element:
+                ul_element = None
             
             # Si on a trouvé une liste, extraire les valeurs
-            if ul_element:
-                list_items = ul_element.find_all('span', class_='a-list-item')
+            if ul_element is not None:
+                list_items = _XP_LIST_ITEMS(ul_element)
                 
                 # Parcourir chaque élément de liste
                 for item in list_items:
                     # Chercher le lien dans l'élément
-                    link = item.find('a', class_='a-link-normal s-navigation-item')
+                    link = _first(_XP_ITEM_LINK, item)
                     
-                    if link:
+                    if link is not None:
                         # Chercher le nom de la valeur dans le lien
-                        value_span = link.find('span', class_='a-size-base a-color-base')
+                        value_span = _first(_XP_VALUE_SPAN, link)
                         
-                        if value_span:
-                            value_name = value_span.text.strip()
-                            value_url = "https://www.amazon.co.uk" + link.get('href')
+                        if value_span is not None:
+                            value_name = value_span.text_content().strip()
+                            value_url = f"{BASE_URL}{link.get('href')}"
                             
                             # Extraire l'ID du filtre depuis l'URL
                             filter_key = None
@@ -117,11 +192,9 @@ def scrape_amazon_filters(category=None, max_pages=5, max_products=100, output_f
                                     # Convertir les caractères encodés
                                     rh_part = rh_part.replace('%3A', ':').replace('%2C', ',')
                                     # Chercher les parties p_XXX:YYYY
-                                    filter_parts = re.findall(r'([p|n]_[^:,]+):([^,]+)', rh_part)
+                                    filter_parts = _FILTER_RE.findall(rh_part)
                                     
                                     # Trouver la partie qui diffère de l'URL de base
-                                    base_filters = set(re.findall(r'([p|n]_[^:,]+):([^,]+)', url.split('rh=')[1].split('&')[0].replace('%3A', ':').replace('%2C', ',')))
-                                    
                                     for key, val in filter_parts:
                                         if (key, val) not in base_filters:
                                             filter_key = key
@@ -148,15 +221,16 @@ def scrape_amazon_filters(category=None, max_pages=5, max_products=100, output_f
             if category_values:
                 filtered_data['filters'][category_name] = category_values
         
-        # Enregistrer les résultats dans un fichier JSON
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(filtered_data, f, indent=4, ensure_ascii=False)
+        # Enregistrer les résultats dans un fichier JSON (orjson écrit directement des octets UTF-8)
+        payload = orjson.dumps(filtered_data, option=orjson.OPT_INDENT_2)
+        with open(output_file, 'wb') as f:
+            f.write(payload)
         
         print(f"\nLes données ont été enregistrées dans '{output_file}'")
         
-        # Afficher le JSON dans la console pour vérification
-        print("\nPrévisualisation du JSON:")
-        print(json.dumps(filtered_data, indent=2, ensure_ascii=False))
+        # Prévisualisation du JSON uniquement en mode debug (évite de sérialiser tout le résultat)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Prévisualisation du JSON:\n%s", payload.decode('utf-8'))
         
         return filtered_data
     
@@ -170,5 +244,8 @@ def scrape_amazon_filters(category=None, max_pages=5, max_products=100, output_f
         return None
 
 if __name__ == "__main__":
+    # --no-cache : vider le cache HTTP pour forcer le téléchargement des pages
+    if '--no-cache' in sys.argv[1:] and CachedSession is not None:
+        get_session().cache.clear()
     print("Démarrage du scraping des filtres d'ordinateurs sur Amazon UK...")
     scrape_amazon_filters()
\ No newline at end of file
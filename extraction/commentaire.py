@@ -1,17 +1,30 @@
 import logging
 import json
+import pickle
 import re
 import time
-import csv
 import os
 import random
+import signal
+import sys
+import threading
 import pandas as pd
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from itertools import islice
+from multiprocessing import Pool, Value
+from multiprocessing.util import Finalize
+import lxml.html
+from lxml import etree
 from selenium import webdriver
 from selenium.webdriver.firefox.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+from utils.token_bucket import get_amazon_bucket, RATE_LIMIT_PENALTY_SECONDS
+
 # Configuration du logger
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -20,6 +33,96 @@ logger = logging.getLogger(__name__)
 PRODUCTS_CSV = "data/amazon_products_all.csv"
 OUTPUT_CSV = "data/amazon_reviews_all.csv"
 PROGRESS_FILE = "data/scraping_progress.json"
+# Copie de l'index asin -> reviewers, rechargée au démarrage si elle est plus récente que le CSV
+ALREADY_SCRAPED_FILE = "data/already_scraped.pkl"
+
+# Fréquence (en produits) de sauvegarde de l'index des reviewers pendant main()
+INDEX_SAVE_EVERY = 20
+
+# Fréquence (en produits) de sauvegarde de la progression pendant main()
+PROGRESS_SAVE_EVERY = 10
+
+# Colonnes du fichier des produits utilisées pour le scraping des avis
+PRODUCT_COLUMNS = ['url', 'asin', 'titre']
+
+# Colonnes du fichier des avis, dans l'ordre d'écriture
+REVIEW_COLUMNS = ['asin', 'reviewer', 'rating', 'title', 'date', 'location',
+                  'verified_purchase', 'comment', 'helpful_count']
+
+# Requêtes HTTP directes : même User-Agent que le navigateur Selenium
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/113.0',
+    'Accept-Language': 'en-GB,en;q=0.9',
+}
+REQUEST_TIMEOUT = (5, 15)
+
+# Codes HTTP par lesquels Amazon signale un débit trop élevé : tous les workers ralentissent
+THROTTLE_STATUS_CODES = (429, 503)
+
+# Marqueurs d'une page CAPTCHA dans le HTML renvoyé par Amazon
+CAPTCHA_MARKERS = ('captchacharacters', '/errors/validateCaptcha')
+
+# Une session HTTP par thread (requests.Session n'est pas garanti thread-safe)
+_local = threading.local()
+
+# URL d'un serveur Selenium (standalone ou Grid) partagé, ex. http://localhost:4444/wd/hub.
+# Si elle est définie, les navigateurs sont ouverts sur ce serveur au lieu de lancer geckodriver localement
+SELENIUM_URL_ENV = 'SCRAPER_SELENIUM_URL'
+
+# Nombre de processus (un navigateur chacun) pour le scraping des avis dans main()
+REVIEW_WORKERS = 3
+
+# Pause aléatoire (en secondes) entre deux produits, tous processus confondus
+PRODUCT_PAUSE_RANGE = (5, 15)
+
+# Navigateur du processus courant du pool (initialisé par _init_worker)
+_worker_driver = None
+# Heure (time.time) à partir de laquelle le prochain produit peut démarrer, partagée par le pool
+_next_start = None
+
+# Statut renvoyé par un processus du pool quand le produit n'a pas pu être traité
+STATUS_CAPTCHA = 'captcha'
+STATUS_NO_DRIVER = 'no_driver'
+
+class CaptchaError(Exception):
+    """CAPTCHA Amazon qui ne peut pas être résolu manuellement (pas de console disponible)."""
+
+# Expressions régulières compilées une seule fois (appliquées à chaque avis)
+_ASIN_RE = re.compile(r'/dp/([A-Z0-9]{10})')
+_RATING_RE = re.compile(r'(\d+\.\d+|\d+)')
+_STAR_CLASS_RE = re.compile(r'a-star-(\d+)')
+_LOCDATE_RE = re.compile(r'Reviewed in (.*?) on (.*)')
+
+def _has_class(name):
+    """Condition XPath équivalente au sélecteur CSS '.name'."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+# Requêtes XPath compilées une seule fois, appliquées au HTML de la page
+_XP_REVIEWS = etree.XPath('//div[@data-hook="review"]')
+_XP_REVIEW_CARDS = etree.XPath('//div[substring(@id, string-length(@id) - 11) = "-review-card"]')
+_XP_REVIEWER = etree.XPath(f'.//a[{_has_class("a-profile")}]//span[{_has_class("a-profile-name")}]')
+_XP_RATING = etree.XPath('.//i[@data-hook="review-star-rating"]')
+_XP_STAR_CLASS = etree.XPath('.//*[contains(@class, "a-star-")]/@class')
+# Titre et contenu : seulement le texte visible, sans la note cachée (a-icon-alt) ni le lien "Read more"
+_XP_TITLE = etree.XPath(
+    f'.//a[@data-hook="review-title"]//span[not({_has_class("a-icon-alt")})]/text()'
+)
+_XP_DATE = etree.XPath('.//span[@data-hook="review-date"]')
+_XP_VERIFIED = etree.XPath('.//span[@data-hook="avp-badge"]')
+_XP_BODY = etree.XPath(
+    f'.//span[@data-hook="review-body"]//span[not(ancestor::*[{_has_class("a-expander-header")}])]/text()'
+)
+_XP_HELPFUL = etree.XPath('.//span[@data-hook="helpful-vote-statement"]')
+
+def _first_text(xpath, element):
+    """Texte (sans espaces de bord) du premier résultat d'une requête XPath, ou None."""
+    nodes = xpath(element)
+    return nodes[0].text_content().strip() if nodes else None
+
+def _joined_text(xpath, element):
+    """Nœuds texte d'une requête XPath réunis en une chaîne (sans espaces de bord), ou None."""
+    text = ' '.join(node.strip() for node in xpath(element) if node.strip())
+    return text or None
 
 def setup_driver():
     """Configure et retourne une instance du WebDriver Firefox."""
@@ -36,6 +139,14 @@ def setup_driver():
     # Décommentez pour exécuter en mode headless (sans interface graphique)
     # options.add_argument("--headless")
     
+    selenium_url = os.environ.get(SELENIUM_URL_ENV)
+    if selenium_url:
+        # Session sur le serveur Selenium partagé : pas de geckodriver lancé par ce processus
+        logger.info(f"Connexion au serveur Selenium {selenium_url}")
+        driver = webdriver.Remote(command_executor=selenium_url, options=options)
+        logger.info("Firefox WebDriver distant initialisé avec succès")
+        return driver
+    
     try:
         # Version simple sans geckodriver spécifique
         driver = webdriver.Firefox(options=options)
@@ -53,28 +164,62 @@ def setup_driver():
         raise
 
 def load_already_scraped_reviews():
-    """Charge les commentaires déjà scrapés pour éviter les duplicats."""
-    already_scraped = {}
+    """
+    Charge les commentaires déjà scrapés pour éviter les duplicats.
     
+    Le résultat est mis en cache tant que le fichier des avis n'a pas changé (date de
+    modification et taille) : les appels répétés, par exemple depuis scrape_reviews,
+    ne relisent pas le CSV. Le dictionnaire renvoyé est partagé entre ces appels.
+    """
     # Vérifier si le fichier de sortie existe
-    if os.path.exists(OUTPUT_CSV):
-        try:
-            # Chargement des avis déjà scrapés
-            df = pd.read_csv(OUTPUT_CSV)
-            # Créer un dictionnaire avec asin et reviewer comme clés
-            for _, row in df.iterrows():
-                asin = row.get('asin', '')
-                reviewer = row.get('reviewer', '')
-                if asin not in already_scraped:
-                    already_scraped[asin] = set()
-                already_scraped[asin].add(reviewer)
-            
-            logger.info(f"Chargé {len(already_scraped)} produits avec des avis déjà scrapés")
-        except Exception as e:
-            logger.error(f"Erreur lors du chargement des avis existants: {e}")
+    try:
+        stat = os.stat(OUTPUT_CSV)
+    except OSError:
+        return {}
+    
+    return _load_already_scraped_reviews(stat.st_mtime_ns, stat.st_size)
+
+@lru_cache(maxsize=1)
+def _load_already_scraped_reviews(mtime_ns, size):
+    """Lit le fichier des avis (mtime_ns et size ne servent que de clé de cache)."""
+    already_scraped = {}
+    
+    # Index sauvegardé par main() : valable s'il a été écrit après la dernière modification du CSV
+    try:
+        if os.stat(ALREADY_SCRAPED_FILE).st_mtime_ns >= mtime_ns:
+            with open(ALREADY_SCRAPED_FILE, 'rb') as f:
+                already_scraped = pickle.load(f)
+            logger.info(f"Chargé {len(already_scraped)} produits avec des avis déjà scrapés depuis {ALREADY_SCRAPED_FILE}")
+            return already_scraped
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning(f"Index {ALREADY_SCRAPED_FILE} illisible, relecture du CSV: {e}")
+    
+    try:
+        # Chargement des avis déjà scrapés
+        # Colonnes lues en chaînes (sans inférence de types) et avis sans reviewer ignorés
+        df = pd.read_csv(OUTPUT_CSV, usecols=['asin', 'reviewer'], dtype=str).dropna(subset=['reviewer'])
+        # Créer un dictionnaire asin -> ensemble des reviewers (groupby vectorisé, sans iterrows)
+        already_scraped = df.groupby('asin', dropna=False, sort=False)['reviewer'].agg(set).to_dict()
+        
+        logger.info(f"Chargé {len(already_scraped)} produits avec des avis déjà scrapés")
+    except Exception as e:
+        logger.error(f"Erreur lors du chargement des avis existants: {e}")
     
     return already_scraped
 
+def save_already_scraped_reviews(already_scraped):
+    """Sauvegarde l'index asin -> reviewers pour éviter de relire tout le CSV au prochain démarrage."""
+    tmp_file = f"{ALREADY_SCRAPED_FILE}.tmp"
+    try:
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(already_scraped, f, protocol=pickle.HIGHEST_PROTOCOL)
+        # Remplacement atomique : jamais de fichier à moitié écrit
+        os.replace(tmp_file, ALREADY_SCRAPED_FILE)
+    except Exception as e:
+        logger.error(f"Erreur lors de la sauvegarde de l'index des avis: {e}")
+
 def load_progress():
     """Charge la progression du scraping pour reprendre où on s'était arrêté."""
     if os.path.exists(PROGRESS_FILE):
@@ -95,18 +240,84 @@ def save_progress(index):
     except Exception as e:
         logger.error(f"Erreur lors de la sauvegarde de la progression: {e}")
 
-def scrape_amazon_product_info(url, asin, title, already_scraped_reviewers=None):
-    """Scrape les informations du produit et les avis de la page produit Amazon avec Selenium."""
+def get_session():
+    """Retourne la session HTTP du thread courant (créée au premier appel)."""
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        session.headers.update(HEADERS)
+        _local.session = session
+    return session
+
+def fetch_reviews_http(url, asin, already_scraped_reviewers, max_reviews=None):
+    """
+    Extraire les avis de la page produit avec une simple requête HTTP, sans navigateur.
+    
+    Retourne None si la page n'est pas exploitable (erreur HTTP, CAPTCHA, aucun bloc d'avis
+    dans le HTML) : l'appelant se rabat alors sur Selenium.
+    
+    La requête prend un jeton du quota Amazon partagé ; une réponse 429/503 pénalise le
+    quota (pendant la durée Retry-After si Amazon la fournit) pour ralentir tous les workers.
+    """
+    bucket = get_amazon_bucket()
+    bucket.acquire()
+    try:
+        response = get_session().get(url, timeout=REQUEST_TIMEOUT)
+    except requests.RequestException as e:
+        logger.info(f"Requête HTTP échouée ({e}), passage à Selenium")
+        return None
+    
+    if response.status_code in THROTTLE_STATUS_CODES:
+        retry_after = response.headers.get('Retry-After', '')
+        bucket.penalize(float(retry_after) if retry_after.isdigit() else RATE_LIMIT_PENALTY_SECONDS)
+    
+    if response.status_code != 200:
+        logger.info(f"Réponse HTTP {response.status_code}, passage à Selenium")
+        return None
+    
+    html = response.text
+    if any(marker in html for marker in CAPTCHA_MARKERS):
+        logger.info("CAPTCHA dans la réponse HTTP, passage à Selenium")
+        return None
+    
+    tree = lxml.html.fromstring(response.content)
+    review_elements = _XP_REVIEWS(tree) or _XP_REVIEW_CARDS(tree)
+    if not review_elements:
+        logger.info("Aucun avis dans le HTML statique, passage à Selenium")
+        return None
+    
+    logger.info(f"Nombre d'avis trouvés sur la page (HTTP): {len(review_elements)}")
+    return list(islice(iter_reviews(review_elements, asin, already_scraped_reviewers), max_reviews))
+
+def scrape_amazon_product_info(url, asin, title, already_scraped_reviewers=None, max_reviews=None,
+                               driver=None, interactive_captcha=True):
+    """
+    Scrape les informations du produit et les avis de la page produit Amazon.
+    
+    La page est d'abord demandée en HTTP (rapide, sans navigateur) ; Selenium n'est utilisé
+    qu'en secours (CAPTCHA, page incomplète). Si un driver est fourni, il est réutilisé
+    (et remis à zéro à la fin) au lieu d'ouvrir et de fermer un navigateur pour ce seul produit.
+    
+    Sans interactive_captcha, un CAPTCHA lève CaptchaError au lieu d'attendre l'utilisateur.
+    """
     if already_scraped_reviewers is None:
         already_scraped_reviewers = set()
         
     logger.info(f"Début du scraping pour le produit: {title} (ASIN: {asin})")
     
-    driver = setup_driver()
+    reviews = fetch_reviews_http(url, asin, already_scraped_reviewers, max_reviews)
+    if reviews is not None:
+        logger.info(f"Scraping produit terminé (HTTP): {len(reviews)} nouveaux avis extraits")
+        return reviews
+    
+    owns_driver = driver is None
+    if owns_driver:
+        driver = setup_driver()
     
     try:
-        # Naviguer vers l'URL
+        # Naviguer vers l'URL (un jeton du quota Amazon partagé par chargement de page)
         logger.info(f"Navigation vers {url}")
+        get_amazon_bucket().acquire()
         driver.get(url)
         
         # Attendre que la page se charge complètement
@@ -115,35 +326,124 @@ def scrape_amazon_product_info(url, asin, title, already_scraped_reviewers=None)
         )
         
         # Vérifier et gérer les CAPTCHAs
-        if not handle_captcha(driver):
+        if not handle_captcha(driver, interactive=interactive_captcha):
             return []
             
         logger.info("Page chargée avec succès")
         
         # Extraire les avis de la page actuelle
-        reviews = extract_reviews_from_page(driver, asin, already_scraped_reviewers)
+        reviews = extract_reviews_from_page(driver, asin, already_scraped_reviewers, max_reviews)
         
         logger.info(f"Scraping produit terminé: {len(reviews)} nouveaux avis extraits")
         return reviews
     
+    except CaptchaError:
+        raise
+    
     except Exception as e:
         logger.error(f"Erreur: {e}")
         return []
     
     finally:
-        # Fermer le navigateur
-        logger.info("Fermeture du navigateur")
-        driver.quit()
+        if owns_driver:
+            # Fermer le navigateur
+            logger.info("Fermeture du navigateur")
+            driver.quit()
+        else:
+            reset_driver(driver)
 
+def reset_driver(driver):
+    """Remettre à zéro un navigateur réutilisé (cookies, page courante) entre deux produits."""
+    try:
+        driver.delete_all_cookies()
+        driver.get("about:blank")
+    except Exception as e:
+        logger.warning(f"Erreur lors de la remise à zéro du navigateur: {e}")
+
+@lru_cache(maxsize=4096)
 def extract_asin_from_url(url):
-    """Extraire l'ASIN du produit à partir de l'URL."""
-    asin_match = re.search(r'/dp/([A-Z0-9]{10})', url)
+    """Extraire l'ASIN du produit à partir de l'URL (résultat mis en cache par URL)."""
+    # Cas courant : l'ASIN suit directement le premier '/dp/' (sans passer par la regex)
+    i = url.find('/dp/')
+    if i != -1:
+        candidate = url[i + 4:i + 14]
+        if len(candidate) == 10 and candidate.isascii() and candidate.isalnum() and candidate == candidate.upper():
+            return candidate
+    
+    asin_match = _ASIN_RE.search(url)
     if asin_match:
         return asin_match.group(1)
     return None
 
-def extract_reviews_from_page(driver, asin, already_scraped_reviewers):
-    """Extraire les avis de la page actuelle au format spécifié."""
+def iter_reviews(review_elements, asin, already_scraped_reviewers):
+    """
+    Extraire les avis un par un (générateur) à partir des blocs d'avis de la page.
+    
+    Les avis ne sont extraits qu'à la demande : l'appelant peut s'arrêter dès qu'il en a assez.
+    """
+    for review_element in review_elements:
+        try:
+            # Extraire le nom du reviewer d'abord pour vérifier s'il est déjà scrapé
+            reviewer_name = _first_text(_XP_REVIEWER, review_element) or "Anonyme"
+            
+            # Vérifier si cet avis a déjà été scrapé pour ce produit
+            if reviewer_name in already_scraped_reviewers:
+                logger.info(f"Avis de '{reviewer_name}' déjà scrapé pour ce produit, ignoré")
+                continue
+            
+            # Initialiser un dictionnaire pour stocker les informations de l'avis
+            review_data = {'asin': asin, 'reviewer': reviewer_name}
+            
+            # 2. Note (étoiles)
+            rating_text = _first_text(_XP_RATING, review_element)
+            rating_match = _RATING_RE.search(rating_text) if rating_text is not None else None
+            if rating_text is None:
+                # Méthode alternative basée sur les classes
+                star_classes = _XP_STAR_CLASS(review_element)
+                rating_match = _STAR_CLASS_RE.search(star_classes[0]) if star_classes else None
+            review_data['rating'] = float(rating_match.group(1)) if rating_match else 0
+            
+            # 3. Titre de l'avis
+            review_data['title'] = _joined_text(_XP_TITLE, review_element) or "Sans titre"
+            
+            # 4. Date et lieu de l'avis
+            full_date_text = _first_text(_XP_DATE, review_element)
+            if full_date_text is None:
+                review_data['location'] = "Unknown"
+                review_data['date'] = "Date inconnue"
+            else:
+                # Extraire le lieu et la date avec regex
+                match = _LOCDATE_RE.search(full_date_text)
+                
+                if match:
+                    review_data['location'] = match.group(1)
+                    review_data['date'] = match.group(2)
+                else:
+                    # Si le pattern ne correspond pas, garder la chaîne complète dans date
+                    review_data['location'] = "Unknown"
+                    review_data['date'] = full_date_text
+            
+            # 5. Achat vérifié
+            review_data['verified_purchase'] = bool(_XP_VERIFIED(review_element))
+            
+            # 6. Contenu de l'avis
+            comment = _joined_text(_XP_BODY, review_element)
+            review_data['comment'] = comment if comment is not None else "Aucun commentaire disponible"
+            
+            # 7. Nombre de personnes qui ont trouvé cet avis utile
+            helpful_text = _first_text(_XP_HELPFUL, review_element)
+            # Premier nombre du texte ("5 people found this helpful"), sans regex
+            review_data['helpful_count'] = next(
+                (int(token) for token in helpful_text.split() if token.isdecimal()), 0
+            ) if helpful_text else 0
+            
+            yield review_data
+            
+        except Exception as e:
+            logger.error(f"Erreur lors de l'extraction d'un avis: {e}")
+
+def extract_reviews_from_page(driver, asin, already_scraped_reviewers, max_reviews=None):
+    """Extraire les avis de la page actuelle au format spécifié (au plus max_reviews si fourni)."""
     logger.info("Extraction des avis")
     reviews = []
     
@@ -162,115 +462,42 @@ def extract_reviews_from_page(driver, asin, already_scraped_reviewers):
         # Attendre un court instant pour s'assurer que tout est chargé
         time.sleep(2)
         
+        # Récupérer le HTML une seule fois et l'analyser avec lxml : un seul aller-retour
+        # WebDriver au lieu d'un find_element par champ et par avis
+        tree = lxml.html.fromstring(driver.page_source)
+        
         # Rechercher les blocs d'avis avec différents sélecteurs possibles
-        review_elements = driver.find_elements(By.CSS_SELECTOR, 'div[data-hook="review"]')
+        review_elements = _XP_REVIEWS(tree)
         
         if not review_elements:
             # Essayer un autre sélecteur si le premier ne fonctionne pas
-            review_elements = driver.find_elements(By.CSS_SELECTOR, 'div[id$="-review-card"]')
+            review_elements = _XP_REVIEW_CARDS(tree)
         
         logger.info(f"Nombre d'avis trouvés sur la page: {len(review_elements)}")
         
-        for review_element in review_elements:
-            try:
-                # Extraire le nom du reviewer d'abord pour vérifier s'il est déjà scrapé
-                try:
-                    profile_element = review_element.find_element(By.CSS_SELECTOR, 'a.a-profile')
-                    name_element = profile_element.find_element(By.CSS_SELECTOR, 'span.a-profile-name')
-                    reviewer_name = name_element.text.strip()
-                except:
-                    reviewer_name = "Anonyme"
-                
-                # Vérifier si cet avis a déjà été scrapé pour ce produit
-                if reviewer_name in already_scraped_reviewers:
-                    logger.info(f"Avis de '{reviewer_name}' déjà scrapé pour ce produit, ignoré")
-                    continue
-                
-                # Initialiser un dictionnaire pour stocker les informations de l'avis
-                review_data = {'asin': asin, 'reviewer': reviewer_name}
-                
-                # 2. Note (étoiles)
-                try:
-                    rating_element = review_element.find_element(By.CSS_SELECTOR, 'i[data-hook="review-star-rating"]')
-                    rating_text = rating_element.get_attribute('textContent') or rating_element.text
-                    rating_match = re.search(r'(\d+\.\d+|\d+)', rating_text)
-                    review_data['rating'] = float(rating_match.group(1)) if rating_match else 0
-                except:
-                    try:
-                        # Méthode alternative basée sur les classes
-                        rating_element = review_element.find_element(By.CSS_SELECTOR, '[class*="a-star-"]')
-                        star_class = rating_element.get_attribute('class')
-                        star_class_match = re.search(r'a-star-(\d+)', star_class)
-                        review_data['rating'] = float(star_class_match.group(1)) if star_class_match else 0
-                    except:
-                        review_data['rating'] = 0
-                
-                # 3. Titre de l'avis
-                try:
-                    title_element = review_element.find_element(By.CSS_SELECTOR, 'a[data-hook="review-title"]')
-                    review_data['title'] = title_element.text.strip()
-                except:
-                    review_data['title'] = "Sans titre"
-                
-                # 4. Date et lieu de l'avis
-                try:
-                    date_element = review_element.find_element(By.CSS_SELECTOR, 'span[data-hook="review-date"]')
-                    full_date_text = date_element.text.strip()
-                    # Extraire le lieu et la date avec regex
-                    location_date_pattern = r'Reviewed in (.*?) on (.*)'
-                    match = re.search(location_date_pattern, full_date_text)
-                    
-                    if match:
-                        review_data['location'] = match.group(1)
-                        review_data['date'] = match.group(2)
-                    else:
-                        # Si le pattern ne correspond pas, garder la chaîne complète dans date
-                        review_data['location'] = "Unknown"
-                        review_data['date'] = full_date_text
-                except:
-                    review_data['location'] = "Unknown"
-                    review_data['date'] = "Date inconnue"
-                
-                # 5. Achat vérifié
-                try:
-                    review_element.find_element(By.CSS_SELECTOR, 'span[data-hook="avp-badge"]')
-                    review_data['verified_purchase'] = True
-                except:
-                    review_data['verified_purchase'] = False
-                
-                # 6. Contenu de l'avis
-                try:
-                    review_body_element = review_element.find_element(By.CSS_SELECTOR, 'span[data-hook="review-body"]')
-                    review_data['comment'] = review_body_element.text.strip()
-                except:
-                    review_data['comment'] = "Aucun commentaire disponible"
-                
-                # 7. Nombre de personnes qui ont trouvé cet avis utile
-                try:
-                    helpful_element = review_element.find_element(By.CSS_SELECTOR, 'span[data-hook="helpful-vote-statement"]')
-                    helpful_text = helpful_element.text.strip()
-                    helpful_match = re.search(r'(\d+)', helpful_text)
-                    review_data['helpful_count'] = int(helpful_match.group(1)) if helpful_match else 0
-                except:
-                    review_data['helpful_count'] = 0
-                
-                reviews.append(review_data)
-                
-            except Exception as e:
-                logger.error(f"Erreur lors de l'extraction d'un avis: {e}")
+        # Extraire les avis à la demande, en s'arrêtant à max_reviews
+        reviews = list(islice(iter_reviews(review_elements, asin, already_scraped_reviewers), max_reviews))
     
     except Exception as e:
         logger.error(f"Erreur lors de l'extraction des avis: {e}")
     
     return reviews
 
-def handle_captcha(driver):
-    """Détecte et gère les CAPTCHA d'Amazon."""
+def handle_captcha(driver, interactive=True):
+    """
+    Détecte et gère les CAPTCHA d'Amazon.
+    
+    En mode interactif, attend que l'utilisateur résolve le CAPTCHA dans le navigateur ;
+    sinon (processus sans console, ex. pool de main()) lève CaptchaError.
+    """
     try:
         # Vérifier la présence d'un CAPTCHA
         if "captcha" in driver.current_url.lower() or driver.find_elements(By.ID, "captchacharacters"):
             logger.warning("CAPTCHA détecté! Le script ne peut pas continuer automatiquement.")
             
+            if not interactive:
+                raise CaptchaError(driver.current_url)
+            
             # Attendre que l'utilisateur résolve le CAPTCHA manuellement
             input("Veuillez résoudre le CAPTCHA dans le navigateur puis appuyez sur Entrée pour continuer...")
             
@@ -281,6 +508,12 @@ def handle_captcha(driver):
             
             logger.info("CAPTCHA résolu, reprise du scraping.")
             return True
+    except CaptchaError:
+        raise
+    except EOFError:
+        # Pas d'entrée standard : personne ne peut confirmer la résolution du CAPTCHA
+        logger.error("CAPTCHA non résolu (aucune console disponible). Abandon.")
+        return False
     except:
         pass
     
@@ -298,22 +531,15 @@ def save_reviews_to_csv(reviews, output_file):
         # Créer le répertoire de sortie si nécessaire
         os.makedirs(os.path.dirname(output_file), exist_ok=True)
         
-        # Ecrire en mode 'a' (append) si le fichier existe déjà, sinon en mode 'w'
-        mode = 'a' if file_exists else 'w'
-        with open(output_file, mode, newline='', encoding='utf-8') as f:
-            # Définir les colonnes
-            fieldnames = ['asin', 'reviewer', 'rating', 'title', 'date', 'location', 
-                         'verified_purchase', 'comment', 'helpful_count']
-            
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            
-            # Écrire l'en-tête uniquement si le fichier est nouveau
-            if not file_exists:
-                writer.writeheader()
-            
-            # Écrire les avis
-            for review in reviews:
-                writer.writerow({field: review.get(field, '') for field in fieldnames})
+        # Ecrire en mode 'a' (append) si le fichier existe déjà, sinon en mode 'w' avec l'en-tête.
+        # Un seul to_csv pour tous les avis ; les champs absents sont écrits vides
+        pd.DataFrame(reviews, columns=REVIEW_COLUMNS).to_csv(
+            output_file,
+            mode='a' if file_exists else 'w',
+            header=not file_exists,
+            index=False,
+            encoding='utf-8'
+        )
         
         logger.info(f"{len(reviews)} nouveaux avis sauvegardés dans {output_file}")
         return True
@@ -347,11 +573,9 @@ def scrape_reviews(url, max_reviews=50):
         already_scraped_reviewers = already_scraped.get(asin, set())
         
         # Scrape reviews
-        reviews = scrape_amazon_product_info(url, asin, title, already_scraped_reviewers)
-        
-        # Limit the number of reviews if needed
-        if max_reviews and len(reviews) > max_reviews:
-            reviews = reviews[:max_reviews]
+        # Extraction stops once max_reviews reviews have been extracted
+        reviews = scrape_amazon_product_info(url, asin, title, already_scraped_reviewers,
+                                             max_reviews=max_reviews or None)
             
         return reviews
         
@@ -359,6 +583,24 @@ def scrape_reviews(url, max_reviews=50):
         logger.error(f"Error scraping reviews: {e}")
         return []
 
+def scrape_many(urls, max_workers=4, max_reviews=50):
+    """
+    Scrape reviews for several Amazon products in parallel.
+    
+    Each worker thread drives its own browser, so max_workers stays small.
+    
+    Args:
+        urls (list): URLs of the Amazon product pages.
+        max_workers (int): Number of products scraped at the same time.
+        max_reviews (int): Maximum number of reviews to scrape per product.
+        
+    Returns:
+        dict: {url: list of review dictionaries}, in the order of urls.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(partial(scrape_reviews, max_reviews=max_reviews), urls)
+        return dict(zip(urls, results))
+
 def main():
     """Fonction principale d'exécution."""
     # Créer le répertoire de données si nécessaire
@@ -378,35 +620,126 @@ def main():
     
     # Lire le fichier CSV des produits
     try:
-        products_df = pd.read_csv(PRODUCTS_CSV)
+        products_df = pd.read_csv(PRODUCTS_CSV, usecols=PRODUCT_COLUMNS, dtype=str)
         logger.info(f"Chargé {len(products_df)} produits depuis {PRODUCTS_CSV}")
     except Exception as e:
         logger.error(f"Erreur lors du chargement du fichier des produits: {e}")
         return
     
-    # Parcourir chaque produit à partir du dernier index sauvegardé
+    # Chaque processus du pool garde son propre navigateur pour tous ses produits
+    if scrape_products(products_df, last_index, already_scraped):
+        logger.info("Scraping terminé pour tous les produits!")
+
+def _init_worker(next_start):
+    """Initialiser un processus du pool : un navigateur Firefox réutilisé pour tous ses produits."""
+    global _worker_driver, _next_start
+    _next_start = next_start
+    try:
+        _worker_driver = setup_driver()
+    except Exception as e:
+        # Ne pas faire échouer l'initialiseur : le pool relancerait le processus indéfiniment.
+        # Chaque produit confié à ce processus est alors signalé au processus principal
+        logger.error(f"Navigateur indisponible dans ce processus: {e}")
+        _worker_driver = None
+        return
+    # Fermer le navigateur à la sortie du processus : normale (pool.close() puis join()) ou sur
+    # pool.terminate(), dont le SIGTERM est converti en sortie propre pour exécuter le Finalize
+    Finalize(None, _worker_driver.quit, exitpriority=10)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+def _wait_turn():
+    """Attendre son tour : les produits démarrent espacés d'une pause aléatoire, tous processus confondus."""
+    with _next_start.get_lock():
+        now = time.time()
+        start = max(now, _next_start.value)
+        _next_start.value = start + random.uniform(*PRODUCT_PAUSE_RANGE)
+    
+    pause_time = start - now
+    if pause_time > 0:
+        logger.info(f"Pause de {pause_time:.2f} secondes avant le prochain produit.")
+        time.sleep(pause_time)
+
+def _scrape_product_job(job):
+    """
+    Scraper les avis d'un produit dans un processus du pool.
+    
+    Retourne (index, asin, avis, statut) ; le statut vaut None si le produit a été traité,
+    STATUS_CAPTCHA ou STATUS_NO_DRIVER sinon (les avis sont alors None).
+    """
+    i, url, asin, title, already_scraped_reviewers = job
+    
+    if _worker_driver is None:
+        return i, asin, None, STATUS_NO_DRIVER
+    
+    _wait_turn()
+    
+    try:
+        reviews = scrape_amazon_product_info(url, asin, title, already_scraped_reviewers,
+                                             driver=_worker_driver, interactive_captcha=False)
+    except CaptchaError:
+        # L'entrée standard d'un processus du pool est /dev/null : c'est au processus principal de décider
+        return i, asin, None, STATUS_CAPTCHA
+    except Exception as e:
+        logger.error(f"Erreur lors du traitement du produit à l'index {i}: {e}")
+        reviews = []
+    return i, asin, reviews, None
+
+def _iter_product_jobs(products_df, last_index, already_scraped):
+    """Générer les produits à scraper (index, url, asin, titre, reviewers déjà scrapés)."""
     for i, row in products_df.iloc[last_index + 1:].iterrows():
-        try:
-            url = row['url']
-            asin = row['asin']
-            title = row['titre']
-            
-            # Vérifier si l'ASIN est valide
-            if not asin or pd.isna(asin):
-                asin = extract_asin_from_url(url)
-                if not asin:
-                    logger.warning(f"Impossible de trouver l'ASIN pour le produit à l'index {i}, URL: {url}")
-                    continue
-            
-            # Récupérer les reviewers déjà scrapés pour ce produit
-            already_scraped_reviewers = already_scraped.get(asin, set())
-            
-            # Si nous avons déjà scrapé ce produit et que l'utilisateur souhaite le sauter
-            if asin in already_scraped and already_scraped_reviewers:
-                logger.info(f"Produit {asin} déjà scrapé avec {len(already_scraped_reviewers)} avis. Vérification de nouveaux avis.")
-            
-            # Scraper les avis pour ce produit
-            reviews = scrape_amazon_product_info(url, asin, title, already_scraped_reviewers)
+        url = row['url']
+        asin = row['asin']
+        title = row['titre']
+        
+        # Vérifier si l'ASIN est valide
+        if not asin or pd.isna(asin):
+            asin = extract_asin_from_url(url)
+            if not asin:
+                logger.warning(f"Impossible de trouver l'ASIN pour le produit à l'index {i}, URL: {url}")
+                continue
+        
+        # Récupérer les reviewers déjà scrapés pour ce produit
+        already_scraped_reviewers = already_scraped.get(asin, set())
+        
+        # Si nous avons déjà scrapé ce produit et que l'utilisateur souhaite le sauter
+        if asin in already_scraped and already_scraped_reviewers:
+            logger.info(f"Produit {asin} déjà scrapé avec {len(already_scraped_reviewers)} avis. Vérification de nouveaux avis.")
+        
+        yield i, url, asin, title, already_scraped_reviewers
+
+def scrape_products(products_df, last_index, already_scraped, workers=REVIEW_WORKERS):
+    """
+    Scraper les avis de chaque produit à partir du dernier index sauvegardé, avec un pool de processus.
+    
+    Selenium n'est pas thread-safe : chaque processus pilote son propre navigateur. Les résultats
+    reviennent dans l'ordre des produits (imap), et seul le processus principal écrit le CSV et
+    la progression, qui reste donc un préfixe contigu de la liste des produits.
+    
+    Sur un CAPTCHA (ou un navigateur qui ne démarre pas), le scraping s'arrête sans marquer le
+    produit comme traité : il sera repris au prochain lancement.
+    
+    Retourne True si tous les produits ont été traités, False si le scraping a été interrompu.
+    """
+    jobs = _iter_product_jobs(products_df, last_index, already_scraped)
+    # Dernier produit traité, pas forcément encore écrit dans le fichier de progression
+    pending_index = None
+    completed = False
+    
+    # Heure de démarrage du prochain produit, partagée par tous les processus du pool
+    next_start = Value('d', 0.0)
+    
+    pool = Pool(processes=workers, initializer=_init_worker, initargs=(next_start,))
+    try:
+        for done, (i, asin, reviews, status) in enumerate(pool.imap(_scrape_product_job, jobs, chunksize=1), 1):
+            if status == STATUS_CAPTCHA:
+                logger.error(f"CAPTCHA détecté pour le produit {asin} (index {i}). "
+                             "Arrêt du scraping : relancez plus tard pour reprendre à ce produit.")
+                pool.terminate()
+                break
+            if status == STATUS_NO_DRIVER:
+                logger.error(f"Navigateur indisponible pour le produit {asin} (index {i}). Arrêt du scraping.")
+                pool.terminate()
+                break
             
             # Sauvegarder les nouveaux avis dans le CSV
             if reviews:
@@ -418,20 +751,30 @@ def main():
                 for review in reviews:
                     already_scraped[asin].add(review['reviewer'])
             
-            # Sauvegarder la progression
-            save_progress(i)
-            
-            # Pause aléatoire entre les requêtes pour éviter la détection
-            pause_time = random.uniform(5, 15)
-            logger.info(f"Pause de {pause_time:.2f} secondes avant le prochain produit.")
-            time.sleep(pause_time)
+            # Sauvegarder la progression par lots (le reste est écrit à la sortie, même sur erreur
+            # ou Ctrl+C) ; au pire quelques produits sont revus au redémarrage, sans doublons d'avis
+            pending_index = i
+            if done % PROGRESS_SAVE_EVERY == 0:
+                save_progress(pending_index)
             
-        except Exception as e:
-            logger.error(f"Erreur lors du traitement du produit à l'index {i}: {e}")
-            # Sauvegarder la progression même en cas d'erreur
-            save_progress(i)
+            # Sauvegarder l'index des reviewers de temps en temps (écrit après le CSV)
+            if done % INDEX_SAVE_EVERY == 0:
+                save_already_scraped_reviews(already_scraped)
+        
+        else:
+            # Sortie normale des processus : chacun ferme son navigateur
+            pool.close()
+            completed = True
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+        if pending_index is not None:
+            save_progress(pending_index)
+        save_already_scraped_reviews(already_scraped)
     
-    logger.info("Scraping terminé pour tous les produits!")
+    return completed
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,11 +1,66 @@
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bs4 import BeautifulSoup, SoupStrainer
+import soupsieve as sv
 import csv
-import time
-import random
 import re
 import os
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.token_bucket import get_amazon_bucket, is_rate_limited_error, RATE_LIMIT_PENALTY_SECONDS
+
+BASE_URL = "https://www.amazon.co.uk"
+
+# En-têtes HTTP partagés par toutes les requêtes
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36',
+    'Accept-Language': 'fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Referer': f'{BASE_URL}/'
+}
+
+REQUEST_TIMEOUT = 30
+
+# Session partagée: réutilise les connexions TCP/TLS (keep-alive) entre les pages
+_SESSION = requests.Session()
+_SESSION.headers.update(HEADERS)
+_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=32,
+    max_retries=Retry(total=5, backoff_factor=0.5)
+))
+
+# Pages de résultats téléchargées en parallèle ; le débit global reste limité
+# par le quota Amazon partagé (utils.token_bucket.get_amazon_bucket)
+MAX_WORKERS = 4
+
+# Sélecteurs CSS compilés une seule fois au chargement du module
+SEL_PRODUCT = sv.compile('.s-result-item[data-component-type="s-search-result"]')
+SEL_TITLE = sv.compile('.a-size-base-plus.a-color-base.a-text-normal')
+SEL_TITLE_FALLBACK = sv.compile('.a-link-normal .a-text-normal')
+SEL_LINK = sv.compile('.a-link-normal')
+SEL_PRICE = sv.compile('.a-price .a-offscreen')
+SEL_RATING = sv.compile('.a-icon-star-small')
+SEL_REVIEWS = sv.compile('.a-size-small .a-link-normal')
+SEL_IMAGE = sv.compile('img.s-image')
+SEL_PAGINATION = sv.compile('.s-pagination-item')
+
+
+def _is_result_or_pagination(name, attrs):
+    """Ne conserver que les fiches produits et les éléments de pagination lors du parsing."""
+    if attrs.get('data-component-type') == 's-search-result':
+        return True
+    classes = attrs.get('class') or ''
+    if isinstance(classes, str):
+        classes = classes.split()
+    return 's-pagination-item' in classes
+
+
+# Le reste de la page (en-têtes, filtres, pied de page...) n'est jamais construit
+PAGE_STRAINER = SoupStrainer(_is_result_or_pagination)
 
 class AmazonProductScraper:
     def __init__(self, base_url="https://www.amazon.co.uk/s?i=computers&rh=n%3A429886031&s=popularity-rank&fs=true"):
@@ -16,13 +71,7 @@ class AmazonProductScraper:
             base_url (str): URL de base pour la recherche de produits.
         """
         self.base_url = base_url
-        self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36',
-            'Accept-Language': 'fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Referer': 'https://www.amazon.co.uk/'
-        }
+        self.headers = HEADERS
         self.products_file = 'amazon_products_all.csv'
         self.current_page = 0
         self.all_fields = []
@@ -57,12 +106,13 @@ class AmazonProductScraper:
             print("Aucun fichier existant trouvé, création d'un nouveau fichier.")
             return False
 
-    def extract_product_info(self, product_element):
+    def extract_product_info(self, product_element, page):
         """
         Extraire les informations d'un produit individuel.
 
         Args:
             product_element: Élément HTML du produit.
+            page (int): Numéro de la page du produit.
 
         Returns:
             dict: Informations du produit.
@@ -70,21 +120,21 @@ class AmazonProductScraper:
         product_info = {}
 
         # Extraire le titre
-        title_element = product_element.select_one('.a-size-base-plus.a-color-base.a-text-normal')
+        title_element = SEL_TITLE.select_one(product_element)
         if not title_element:
-            title_element = product_element.select_one('.a-link-normal .a-text-normal')
+            title_element = SEL_TITLE_FALLBACK.select_one(product_element)
         product_info['titre'] = title_element.text.strip() if title_element else "Titre non disponible"
 
         # Extraire l'URL du produit
-        link_element = product_element.select_one('.a-link-normal')
-        product_info['url'] = "https://www.amazon.co.uk" + link_element['href'] if link_element and 'href' in link_element.attrs else "URL non disponible"
+        link_element = SEL_LINK.select_one(product_element)
+        product_info['url'] = f"{BASE_URL}{link_element['href']}" if link_element and 'href' in link_element.attrs else "URL non disponible"
 
         # Extraire le prix
-        price_element = product_element.select_one('.a-price .a-offscreen')
+        price_element = SEL_PRICE.select_one(product_element)
         product_info['prix'] = price_element.text.strip() if price_element else "Prix non disponible"
 
         # Extraire la note
-        rating_element = product_element.select_one('.a-icon-star-small')
+        rating_element = SEL_RATING.select_one(product_element)
         if rating_element:
             rating_text = rating_element.text.strip()
             product_info['note'] = rating_text
@@ -92,11 +142,11 @@ class AmazonProductScraper:
             product_info['note'] = "Note non disponible"
 
         # Extraire le nombre d'avis
-        reviews_element = product_element.select_one('.a-size-small .a-link-normal')
+        reviews_element = SEL_REVIEWS.select_one(product_element)
         product_info['nombre_avis'] = reviews_element.text.strip() if reviews_element else "Nombre d'avis non disponible"
 
         # Extraire l'image
-        img_element = product_element.select_one('img.s-image')
+        img_element = SEL_IMAGE.select_one(product_element)
         product_info['image_url'] = img_element['src'] if img_element and 'src' in img_element.attrs else "Image non disponible"
 
         # ASIN (identifiant unique Amazon)
@@ -113,7 +163,7 @@ class AmazonProductScraper:
         product_info['asin'] = asin if asin else "ASIN non disponible"
 
         # Ajouter le numéro de page comme information supplémentaire
-        product_info['page'] = self.current_page
+        product_info['page'] = page
 
         return product_info
 
@@ -127,7 +177,7 @@ class AmazonProductScraper:
         Returns:
             int: Numéro de la dernière page.
         """
-        pagination_items = soup.select('.s-pagination-item')
+        pagination_items = SEL_PAGINATION.select(soup)
         max_page = 1
 
         for item in pagination_items:
@@ -141,53 +191,90 @@ class AmazonProductScraper:
 
         return max_page
 
-    def scrape_page(self, url):
+    def scrape_page(self, url, page):
         """
         Scraper une page spécifique.
 
+        Peut être appelée depuis plusieurs threads : ne modifie pas l'état du scraper
+        (le filtrage des doublons est fait par filter_new_products).
+
         Args:
             url (str): URL de la page à scraper.
+            page (int): Numéro de la page.
 
         Returns:
             tuple: (objet BeautifulSoup, liste de produits)
         """
         try:
             # Faire la requête à la page
-            response = requests.get(url, headers=self.headers)
+            response = _SESSION.get(url, headers=self.headers, timeout=REQUEST_TIMEOUT)
             response.raise_for_status()
 
-            # Analyser le HTML
-            soup = BeautifulSoup(response.content, 'html.parser')
+            # Analyser le HTML (pages servies en UTF-8 : pas de détection d'encodage)
+            soup = BeautifulSoup(response.content, 'lxml', parse_only=PAGE_STRAINER,
+                                 from_encoding='utf-8')
 
             # Trouver tous les produits de la page
-            product_elements = soup.select('.s-result-item[data-component-type="s-search-result"]')
-
-            print(f"Nombre de produits trouvés sur la page {self.current_page}: {len(product_elements)}")
+            product_elements = SEL_PRODUCT.select(soup)
 
-            page_products = []
-            skipped_count = 0
-
-            for product in product_elements:
-                product_info = self.extract_product_info(product)
-                
-                # Vérifier si le produit a un ASIN et s'il existe déjà
-                if product_info['asin'] != "ASIN non disponible" and product_info['asin'] in self.existing_asins:
-                    skipped_count += 1
-                    continue
-                
-                if product_info['titre'] != "Titre non disponible":
-                    page_products.append(product_info)
-                    # Ajouter l'ASIN à la liste des existants pour éviter les doublons dans la même session
-                    if product_info['asin'] != "ASIN non disponible":
-                        self.existing_asins.add(product_info['asin'])
+            print(f"Nombre de produits trouvés sur la page {page}: {len(product_elements)}")
 
-            print(f"Produits ignorés car déjà existants: {skipped_count}")
+            page_products = [self.extract_product_info(product, page) for product in product_elements]
             return soup, page_products
 
         except Exception as e:
+            if is_rate_limited_error(e):
+                # Ralentir tous les threads
+                get_amazon_bucket().penalize(RATE_LIMIT_PENALTY_SECONDS)
             print(f"Une erreur s'est produite lors du scraping de {url}: {e}")
             return None, []
 
+    def fetch_listing_page(self, page):
+        """
+        Télécharger et analyser une page de résultats, en respectant le débit autorisé.
+
+        Args:
+            page (int): Numéro de la page.
+
+        Returns:
+            tuple: (objet BeautifulSoup, liste de produits)
+        """
+        next_url = f"{self.base_url}&page={page}&qid=1745394762&ref=sr_pg_{page}"
+        print(f"Scraping de la page {page}...")
+
+        # Attendre un jeton au lieu d'une pause aléatoire fixe
+        get_amazon_bucket().acquire()
+
+        return self.scrape_page(next_url, page)
+
+    def filter_new_products(self, products):
+        """
+        Écarter les produits déjà connus ou sans titre (appelée depuis le thread principal).
+
+        Args:
+            products (list): Produits extraits d'une page.
+
+        Returns:
+            list: Produits nouveaux.
+        """
+        new_products = []
+        skipped_count = 0
+
+        for product_info in products:
+            # Vérifier si le produit a un ASIN et s'il existe déjà
+            if product_info['asin'] != "ASIN non disponible" and product_info['asin'] in self.existing_asins:
+                skipped_count += 1
+                continue
+
+            if product_info['titre'] != "Titre non disponible":
+                new_products.append(product_info)
+                # Ajouter l'ASIN à la liste des existants pour éviter les doublons dans la même session
+                if product_info['asin'] != "ASIN non disponible":
+                    self.existing_asins.add(product_info['asin'])
+
+        print(f"Produits ignorés car déjà existants: {skipped_count}")
+        return new_products
+
     def initialize_csv_file(self, fieldnames, filename):
         """
         Initialiser un fichier CSV avec les en-têtes.
@@ -255,7 +342,8 @@ class AmazonProductScraper:
         if start_page == 1:
             # Commencer par la première page
             current_url = self.base_url
-            soup, products = self.scrape_page(current_url)
+            soup, products = self.scrape_page(current_url, 1)
+            products = self.filter_new_products(products)
 
             if not soup:
                 print("Impossible d'accéder à la première page.")
@@ -283,7 +371,7 @@ class AmazonProductScraper:
             if not max_pages:
                 # Nécessite une requête à la première page pour obtenir le nombre total
                 print("Vérification du nombre total de pages...")
-                temp_soup, _ = self.scrape_page(self.base_url)
+                temp_soup, _ = self.scrape_page(self.base_url, 1)
                 if temp_soup:
                     max_pages = self.get_max_page_number(temp_soup)
                 else:
@@ -293,35 +381,33 @@ class AmazonProductScraper:
         print(f"Nombre total de pages à scraper: {max_pages}")
         print(f"Pages restantes à traiter: {max_pages - start_page + 1}")
 
-        # Parcourir les pages suivantes
+        # Parcourir les pages suivantes : téléchargées en parallèle, traitées dans l'ordre
+        # des pages (le CSV et la reprise sur la dernière page restent cohérents)
         success = True
-        while self.current_page <= max_pages:
-            # Construire l'URL de la page
-            next_url = f"{self.base_url}&page={self.current_page}&qid=1745394762&ref=sr_pg_{self.current_page}"
-
-            print(f"Scraping de la page {self.current_page}...")
-
-            # Pause aléatoire pour éviter d'être détecté comme un robot
-            time.sleep(random.uniform(2, 5))
+        pages = range(self.current_page, max_pages + 1)
+        executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+        try:
+            for page, (_, page_products) in zip(pages, executor.map(self.fetch_listing_page, pages)):
+                self.current_page = page
+                page_products = self.filter_new_products(page_products)
 
-            _, page_products = self.scrape_page(next_url)
+                if page_products:
+                    # Mettre à jour les champs pour inclure de possibles nouveaux champs
+                    self.all_fields = self.determine_all_fields(page_products)
 
-            if page_products:
-                # Mettre à jour les champs pour inclure de possibles nouveaux champs
-                self.all_fields = self.determine_all_fields(page_products)
-                
-                # Ajouter les produits au fichier CSV
-                self.append_to_csv(page_products, self.all_fields, self.products_file)
-                print(f"Page {self.current_page} traitée: {len(page_products)} produits ajoutés au fichier CSV")
-            else:
-                print(f"Aucun produit trouvé sur la page {self.current_page} ou erreur lors du scraping")
-                if self.current_page > start_page:  # Si au moins une page a été traitée avec succès
-                    print("Continuation malgré l'erreur sur cette page...")
+                    # Ajouter les produits au fichier CSV
+                    self.append_to_csv(page_products, self.all_fields, self.products_file)
+                    print(f"Page {page} traitée: {len(page_products)} produits ajoutés au fichier CSV")
                 else:
-                    success = False
-                    break
-
-            self.current_page += 1
+                    print(f"Aucun produit trouvé sur la page {page} ou erreur lors du scraping")
+                    if page > start_page:  # Si au moins une page a été traitée avec succès
+                        print("Continuation malgré l'erreur sur cette page...")
+                    else:
+                        success = False
+                        break
+        finally:
+            # Annuler les pages pas encore lancées si on s'arrête en cours de route
+            executor.shutdown(wait=True, cancel_futures=True)
 
         return success
 
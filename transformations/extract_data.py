@@ -1,12 +1,18 @@
 import boto3
+from botocore.config import Config
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-# Crée un client S3
+# Nombre de téléchargements simultanés (le client boto3 est partagé entre les threads)
+MAX_WORKERS = 16
+
+# Crée un client S3 (une connexion HTTP par thread de téléchargement)
 s3 = boto3.client(
     's3',
     aws_access_key_id='AQQQQ',
     aws_secret_access_key='AXXX',
-    region_name='eu-north-1'
+    region_name='eu-north-1',
+    config=Config(max_pool_connections=MAX_WORKERS)
 )
 
 bucket_name = 'electronique2025'
@@ -15,18 +21,28 @@ prefix = 'web-mining-data/'
 # 📁 Dossier courant où tu as ton script
 local_dir = os.path.dirname(os.path.abspath(__file__))
 
-# Liste les objets S3
-response = s3.list_objects_v2(Bucket=bucket_name, Prefix=prefix)
-for obj in response.get('Contents', []):
-    key = obj['Key']
-    
-    # Ignore les "dossiers" (ex. : juste web-mining-data/)
-    if key.endswith('/'):
-        continue
 
+def download(key):
+    """Télécharge un objet S3 dans le dossier du script."""
     file_name = key.split('/')[-1]
     local_path = os.path.join(local_dir, file_name)
 
     print(f"📥 Téléchargement de {key} vers {local_path}")
     s3.download_file(bucket_name, key, local_path)
     print(f"✅ {file_name} téléchargé.")
+
+
+# Liste les objets S3 page par page (list_objects_v2 s'arrête à 1000 clés par appel)
+paginator = s3.get_paginator('list_objects_v2')
+keys = [
+    obj['Key']
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix)
+    for obj in page.get('Contents', [])
+    # Ignore les "dossiers" (ex. : juste web-mining-data/)
+    if not obj['Key'].endswith('/')
+]
+
+# Téléchargements en parallèle
+with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+    for future in as_completed([executor.submit(download, key) for key in keys]):
+        future.result()
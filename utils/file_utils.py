@@ -8,8 +8,8 @@ File utility functions for handling data storage and retrieval with:
 """
 
 import os
-import json
 import csv
+import orjson
 import pandas as pd
 import logging
 from typing import List, Dict, Any, Optional, Union
@@ -20,6 +20,9 @@ from contextlib import contextmanager
 # Setup logging
 logger = logging.getLogger(__name__)
 
+# orjson options: numpy scalars/arrays and non-string dict keys are serialized natively
+JSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
 @contextmanager
 def file_lock(file_path: str):
     """
@@ -67,9 +70,9 @@ def load_json(file_path: str, default: Any = None) -> Any:
             return default if default is not None else {}
         
         with file_lock(file_path):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-    except json.JSONDecodeError as e:
+            with open(file_path, 'rb') as f:
+                return orjson.loads(f.read())
+    except orjson.JSONDecodeError as e:
         logger.error(f"Error decoding JSON from {file_path}: {e}")
         return default if default is not None else {}
     except Exception as e:
@@ -92,11 +95,9 @@ def save_json(data: Any, file_path: str, pretty: bool = True) -> bool:
         ensure_dir(file_path)
         
         with file_lock(file_path):
-            with open(file_path, 'w', encoding='utf-8') as f:
-                if pretty:
-                    json.dump(data, f, indent=2, ensure_ascii=False)
-                else:
-                    json.dump(data, f, ensure_ascii=False)
+            options = JSON_OPTIONS | orjson.OPT_INDENT_2 if pretty else JSON_OPTIONS
+            with open(file_path, 'wb') as f:
+                f.write(orjson.dumps(data, option=options))
         return True
     except Exception as e:
         logger.error(f"Error saving JSON to {file_path}: {e}")
@@ -175,6 +176,63 @@ def save_csv(data: List[Dict], file_path: str, mode: str = 'w') -> bool:
         logger.error(f"Error saving CSV to {file_path}: {e}")
         return False
 
+def append_dicts_csv(data: List[Dict], file_path: str) -> bool:
+    """
+    Append dictionaries to a CSV file without loading the existing rows
+    
+    The header is written when the file is new. Rows bringing columns the file
+    does not have yet trigger a single rewrite with the union of the columns.
+    
+    Args:
+        data: List of dictionaries to append
+        file_path: Target file path
+    
+    Returns:
+        True if successful, False otherwise
+    """
+    try:
+        if not data:
+            return True
+        
+        ensure_dir(file_path)
+        
+        with file_lock(file_path):
+            fieldnames = []
+            if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
+                with open(file_path, 'r', newline='', encoding='utf-8') as f:
+                    fieldnames = next(csv.reader(f), [])
+            
+            # New columns in first-seen order
+            known = set(fieldnames)
+            new_fields = []
+            for row in data:
+                for key in row:
+                    if key not in known:
+                        known.add(key)
+                        new_fields.append(key)
+            
+            if fieldnames and new_fields:
+                # Widen the header: rewrite the file once with the union of the columns
+                tmp_path = f"{file_path}.tmp"
+                with open(file_path, 'r', newline='', encoding='utf-8') as src, \
+                        open(tmp_path, 'w', newline='', encoding='utf-8') as dst:
+                    writer = csv.DictWriter(dst, fieldnames=fieldnames + new_fields)
+                    writer.writeheader()
+                    writer.writerows(csv.DictReader(src))
+                    writer.writerows(data)
+                os.replace(tmp_path, file_path)
+            else:
+                with open(file_path, 'a', newline='', encoding='utf-8') as f:
+                    writer = csv.DictWriter(f, fieldnames=fieldnames or new_fields)
+                    if not fieldnames:
+                        writer.writeheader()
+                    writer.writerows(data)
+        
+        return True
+    except Exception as e:
+        logger.error(f"Error appending CSV to {file_path}: {e}")
+        return False
+
 def append_to_file(line: str, file_path: str) -> bool:
     """
     Append a line to a text file with error handling
@@ -251,7 +309,8 @@ def merge_csv_files(input_files: List[str], output_file: str, key_column: Option
         for file_path in input_files:
             if os.path.exists(file_path):
                 try:
-                    df = pd.read_csv(file_path, encoding='utf-8')
+                    # pyarrow engine: multithreaded C++ parser
+                    df = pd.read_csv(file_path, encoding='utf-8', engine='pyarrow')
                     dfs.append(df)
                 except Exception as e:
                     logger.error(f"Error reading {file_path}: {e}")
@@ -261,7 +320,7 @@ def merge_csv_files(input_files: List[str], output_file: str, key_column: Option
             return False
         
         # Combine all dataframes
-        merged_df = pd.concat(dfs, ignore_index=True)
+        merged_df = pd.concat(dfs, ignore_index=True, copy=False)
         
         # Deduplicate if key column is provided
         if key_column and key_column in merged_df.columns:
@@ -426,8 +485,8 @@ def export_to_json(input_file: str, output_file: str) -> bool:
             data = df.to_dict('records')
             
             # Save as JSON
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            with open(output_file, 'wb') as f:
+                f.write(orjson.dumps(data, option=JSON_OPTIONS | orjson.OPT_INDENT_2))
             
             logger.info(f"Data exported to JSON: {output_file}")
             return True
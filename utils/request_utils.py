@@ -14,7 +14,7 @@ from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
 import logging
 from airflow.models import Variable
-from functools import wraps
+from functools import wraps, lru_cache
 from typing import Dict, List, Optional, Union, Callable
 
 # Setup logging
@@ -62,7 +62,9 @@ def create_session(
     retries: int = 3, 
     backoff_factor: float = 0.3, 
     status_forcelist: List[int] = [429, 500, 502, 503, 504],
-    use_proxy: bool = False
+    use_proxy: bool = False,
+    pool_connections: int = 10,
+    pool_maxsize: int = 10
 ) -> requests.Session:
     """
     Creates a requests session with retry capabilities and optional proxy
@@ -72,6 +74,8 @@ def create_session(
         backoff_factor: Backoff factor for retry timing
         status_forcelist: HTTP status codes to retry on
         use_proxy: Whether to use a proxy for this session
+        pool_connections: Number of per-host connection pools to cache
+        pool_maxsize: Maximum number of kept-alive connections per host
     
     Returns:
         A configured requests Session object
@@ -83,10 +87,15 @@ def create_session(
         total=retries,
         backoff_factor=backoff_factor,
         status_forcelist=status_forcelist,
-        allowed_methods=["GET", "POST", "HEAD"]
+        allowed_methods=["GET", "POST", "HEAD"],
+        respect_retry_after_header=True
     )
     
-    adapter = HTTPAdapter(max_retries=retry_strategy)
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=retry_strategy
+    )
     session.mount("http://", adapter)
     session.mount("https://", adapter)
     
@@ -193,6 +202,8 @@ def make_request(url: str, method: str = 'GET', params: Dict = None,
     Returns:
         Response object if successful, None if all retries failed
     """
+    global CURRENT_PROXY_INDEX
+    
     for attempt in range(max_retries):
         try:
             # Create a new session for each attempt
@@ -218,7 +229,6 @@ def make_request(url: str, method: str = 'GET', params: Dict = None,
             if is_blocked_response(response):
                 logger.warning(f"Detected blocking at URL {url}. Rotating proxy and retrying.")
                 # Force proxy rotation for next attempt
-                global CURRENT_PROXY_INDEX
                 if PROXY_LIST:
                     CURRENT_PROXY_INDEX = (CURRENT_PROXY_INDEX + 1) % len(PROXY_LIST)
                 time.sleep(5 + attempt * 5)  # Progressive backoff
@@ -236,13 +246,25 @@ def make_request(url: str, method: str = 'GET', params: Dict = None,
             logger.error(f"Request error on attempt {attempt+1}/{max_retries}: {e}")
             # Switch proxy for next attempt
             if use_proxy and PROXY_LIST:
-                global CURRENT_PROXY_INDEX
                 CURRENT_PROXY_INDEX = (CURRENT_PROXY_INDEX + 1) % len(PROXY_LIST)
             time.sleep(2 ** attempt)  # Exponential backoff
     
     logger.error(f"All {max_retries} attempts failed for URL: {url}")
     return None
 
+@lru_cache(maxsize=1)
+def get_amazon_domain() -> str:
+    """
+    Get the Amazon domain from Airflow variables, read once per process
+    
+    Returns:
+        Amazon base domain (default: amazon.com)
+    """
+    try:
+        return Variable.get("amazon_domain", default="amazon.com")
+    except Exception:
+        return "amazon.com"
+
 def get_amazon_url(path: str, params: Dict = None) -> str:
     """
     Construct a proper Amazon URL with locale and tracking parameters stripped
@@ -254,11 +276,8 @@ def get_amazon_url(path: str, params: Dict = None) -> str:
     Returns:
         Properly formatted Amazon URL
     """
-    # Get base domain from Airflow variables or use default
-    try:
-        base_domain = Variable.get("amazon_domain", default="amazon.com")
-    except:
-        base_domain = "amazon.com"
+    # Get base domain from Airflow variables (cached) or use default
+    base_domain = get_amazon_domain()
     
     # Ensure path starts with a slash
     if not path.startswith('/'):
@@ -275,8 +275,8 @@ class ScrapingMetrics:
         """
         def decorator(func):
             def wrapper(*args, **kwargs):
-                timer_name = f"{func.__name__}_{id(func)}"
-                self.start_timer(timer_name)
+                # Local start time: no shared timer key, so concurrent calls don't clash
+                start = time.perf_counter()
                 self.increment('total_requests')
                 
                 try:
@@ -288,9 +288,9 @@ class ScrapingMetrics:
                     self.increment(f'error.{category}')
                     raise
                 finally:
-                    elapsed = self.stop_timer(timer_name, category)
-                    if elapsed is not None:
-                        logger.debug(f"{func.__name__} took {elapsed:.2f}s")
+                    elapsed = time.perf_counter() - start
+                    self.record_time(category, elapsed)
+                    logger.debug(f"{func.__name__} took {elapsed:.2f}s")
             
             return wrapper
         return decorator
@@ -0,0 +1,261 @@
+"""
+Token bucket rate limiting shared across threads, processes and Airflow workers.
+The bucket state lives in Redis so every task hitting the same host draws from one quota.
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+from typing import Optional
+
+try:
+    import redis
+except ImportError:  # Redis is optional: callers fall back to an in-process limiter
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Environment variable holding the Redis URL used for shared rate limiting
+REDIS_URL_ENV = 'SCRAPER_REDIS_URL'
+
+# Seconds to wait for Redis to connect or answer before giving up
+REDIS_SOCKET_TIMEOUT = 2.0
+
+# Common prelude: refill the bucket from the Redis server clock (so workers with skewed
+# clocks agree). ARGV[1] is the capacity, ARGV[2] the refill rate in tokens per second.
+_REFILL_PRELUDE = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'last_refill')
+local tokens = tonumber(state[1])
+local last_refill = tonumber(state[2])
+if tokens == nil then tokens = capacity end
+if last_refill == nil then last_refill = now end
+
+tokens = math.min(capacity, tokens + math.max(0, now - last_refill) * rate)
+"""
+
+# Common epilogue: store the state and keep the key until the bucket is full again
+# (an expired key restarts full, so a penalty must not expire before it has been paid)
+_STORE_EPILOGUE = """
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'last_refill', now)
+redis.call('EXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate) + 60)
+"""
+
+# Try to take ARGV[3] tokens in one atomic step.
+# Returns the number of seconds to wait before retrying (0 when the tokens were taken).
+_ACQUIRE_SCRIPT = _REFILL_PRELUDE + """
+local requested = tonumber(ARGV[3])
+local wait = 0
+if tokens >= requested then
+    tokens = tokens - requested
+else
+    wait = (requested - tokens) / rate
+end
+""" + _STORE_EPILOGUE + """
+return tostring(wait)
+"""
+
+# Remove ARGV[3] seconds worth of tokens, possibly driving the bucket negative.
+_PENALIZE_SCRIPT = _REFILL_PRELUDE + """
+tokens = tokens - tonumber(ARGV[3]) * rate
+""" + _STORE_EPILOGUE
+
+
+class TokenBucket:
+    """
+    Thread-safe in-process token bucket.
+
+    Shared by every thread of one process; used when Redis is not configured.
+    """
+
+    __slots__ = ('capacity', 'rate', '_tokens', '_ts', '_lock')
+
+    def __init__(self, capacity: int, rate: float):
+        """
+        Initialize the bucket, full.
+
+        Args:
+            capacity: Maximum number of tokens in the bucket
+            rate: Tokens added per second
+        """
+        self.capacity = capacity
+        self.rate = float(rate)
+        self._tokens = float(capacity)
+        self._ts = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        """Add the tokens earned since the last update (caller holds the lock)."""
+        self._tokens = min(self.capacity, self._tokens + (now - self._ts) * self.rate)
+        self._ts = now
+
+    def acquire(self, tokens: int = 1):
+        """
+        Block until `tokens` tokens have been taken from the bucket.
+
+        The lock is released while sleeping so other threads are not serialized behind it.
+
+        Args:
+            tokens: Number of tokens to take
+        """
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def penalize(self, seconds: float):
+        """
+        Remove `seconds` worth of tokens, possibly driving the bucket negative.
+
+        Args:
+            seconds: How long callers should be held back
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= seconds * self.rate
+
+
+class RedisTokenBucket:
+    """
+    Token bucket keyed by host and stored in Redis.
+
+    All callers using the same host share `burst` tokens refilled at `rps` per second,
+    whatever process or Airflow worker they run in.
+    """
+
+    def __init__(self, host: str, rps: float, burst: int,
+                 client: Optional["redis.Redis"] = None, jitter: float = 0.1):
+        """
+        Initialize the bucket.
+
+        Args:
+            host: Host the quota applies to (used as the Redis key)
+            rps: Tokens added per second
+            burst: Maximum number of tokens in the bucket
+            client: Redis client (default: built from SCRAPER_REDIS_URL)
+            jitter: Extra random sleep, as a fraction of the wait, to spread out waiters
+        """
+        if client is None:
+            if redis is None:
+                raise ImportError("The redis package is required for RedisTokenBucket")
+            client = redis.Redis.from_url(os.environ[REDIS_URL_ENV],
+                                          socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+                                          socket_timeout=REDIS_SOCKET_TIMEOUT)
+
+        self.host = host
+        self.rps = float(rps)
+        self.burst = burst
+        self.jitter = jitter
+        self.key = f"ratelimit:{host}"
+        self._acquire = client.register_script(_ACQUIRE_SCRIPT)
+        self._penalize = client.register_script(_PENALIZE_SCRIPT)
+
+    @classmethod
+    def from_env(cls, host: str, rps: float, burst: int) -> Optional["RedisTokenBucket"]:
+        """
+        Build a bucket from SCRAPER_REDIS_URL if Redis is configured and reachable.
+
+        Args:
+            host: Host the quota applies to
+            rps: Tokens added per second
+            burst: Maximum number of tokens in the bucket
+
+        Returns:
+            The bucket, or None when Redis is not available
+        """
+        url = os.environ.get(REDIS_URL_ENV)
+        if not url or redis is None:
+            return None
+
+        try:
+            client = redis.Redis.from_url(url,
+                                          socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+                                          socket_timeout=REDIS_SOCKET_TIMEOUT)
+            client.ping()
+            return cls(host, rps, burst, client=client)
+        except Exception as e:
+            logger.warning(f"Shared rate limiter unavailable, using in-process limiter: {str(e)}")
+            return None
+
+    def acquire(self, tokens: int = 1):
+        """
+        Block until `tokens` tokens have been taken from the bucket.
+
+        Args:
+            tokens: Number of tokens to take
+        """
+        while True:
+            wait = float(self._acquire(keys=[self.key], args=[self.burst, self.rps, tokens]))
+            if wait <= 0:
+                return
+            time.sleep(wait + random.uniform(0, wait * self.jitter))
+
+    def penalize(self, seconds: float):
+        """
+        Remove `seconds` worth of tokens, possibly driving the bucket negative.
+
+        Used after a 429 so every worker backs off, not only the one that was throttled.
+
+        Args:
+            seconds: How long the host should be left alone
+        """
+        self._penalize(keys=[self.key], args=[self.burst, self.rps, seconds])
+
+
+# Quota shared by every request to Amazon: listing pages, product details, reviews and
+# category filters all draw from this one bucket (Redis key ratelimit:www.amazon.co.uk)
+AMAZON_HOST = 'www.amazon.co.uk'
+AMAZON_REQUESTS_PER_SECOND = 1.0
+AMAZON_BURST_SIZE = 4
+
+# How long all callers back off after a 429 without a usable Retry-After header
+RATE_LIMIT_PENALTY_SECONDS = 10
+
+_AMAZON_BUCKET = None
+_AMAZON_BUCKET_LOCK = threading.Lock()
+
+
+def get_amazon_bucket():
+    """
+    Return the process-wide bucket throttling requests to Amazon, creating it on first use.
+
+    Backed by Redis (shared by every process and Airflow worker) when SCRAPER_REDIS_URL is
+    set and reachable, in-process otherwise. Every caller gets the same rate and burst, so
+    the shared Redis key is always refilled with the same parameters.
+
+    Returns:
+        RedisTokenBucket or TokenBucket
+    """
+    global _AMAZON_BUCKET
+    with _AMAZON_BUCKET_LOCK:
+        if _AMAZON_BUCKET is None:
+            _AMAZON_BUCKET = (
+                RedisTokenBucket.from_env(AMAZON_HOST, AMAZON_REQUESTS_PER_SECOND, AMAZON_BURST_SIZE)
+                or TokenBucket(AMAZON_BURST_SIZE, AMAZON_REQUESTS_PER_SECOND)
+            )
+        return _AMAZON_BUCKET
+
+
+def is_rate_limited_error(error: Exception) -> bool:
+    """
+    Check whether an exception was caused by an HTTP 429 response.
+
+    Args:
+        error: Exception raised by a request
+
+    Returns:
+        bool: True if the server answered 429 Too Many Requests
+    """
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None) == 429